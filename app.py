@@ -1,60 +1,88 @@
 import streamlit as st
+import html
 import pandas as pd
-import os
 import time
+import threading
 from datetime import datetime
-from dotenv import load_dotenv
 import logging
 # from src.google_oauth import GoogleOAuth
-import gspread
-from langchain.messages import HumanMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 
-from src.job_scraper import JobScraper
-from src.cover_latter_generator import generate_cover_letter, extract_experience_from_cv, extract_name_and_contact_from_cv, save_to_files
+from src.job_scraper import JobScraper, open_jobs_db
+from src.response_cache import ResponseCache
+from src.cover_latter_generator import generate_cover_letter, generate_cover_letters, extract_experience_from_cv, extract_name_and_contact_from_cv, save_to_files, save_cover_letters
 from src.nlp_processing import extract_skills_from_description
-from src.email_sender import send_job_application_email
+from src.cv_parser import parse_cv
+from src.email_outbox import get_outbox
+from src.aggregates import dashboard_metrics
+from src.llm_client import stream_cover_letter_with_gemini, llm_cache_stats
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-# Load environment variables
-load_dotenv(r"C:\Users\nagar\Desktop\my_project\job_automate\JobPilot\.env")
+# --- Shared resources and cached queries ---
+# Resources are created once per process and shared by every session. Query results are
+# memoized on the time of the last ingest, so widget reruns are served without touching
+# the database, and a new crawl invalidates them.
 
-def improve_cover_letter_with_gemini(raw_text: str) -> str:
-    """
-    Uses Gemini 2.5 Flash to improve the cover letter.
-    Loads API key from environment variable GOOGLE_API_KEY.
-    """
+@st.cache_resource
+def get_response_cache():
+    return ResponseCache(stale_while_revalidate=True)
 
-    google_api_key = os.getenv("GOOGLE_API_KEY")
-    if not google_api_key:
-        raise ValueError("GOOGLE_API_KEY is not set in environment variables.")
+@st.cache_resource
+def get_scraper():
+    return JobScraper(job_titles=[], results_per_page=50, cache=get_response_cache())
 
-    llm = ChatGoogleGenerativeAI(
-        model="gemini-2.5-flash",
-        temperature=0.2,
-        google_api_key=google_api_key
-    )
+@st.cache_resource
+def get_metrics_db():
+    # The dashboard only reads aggregates, so it opens the database without Adzuna credentials
+    return open_jobs_db(check_same_thread=False), threading.Lock()
+
+def read_dashboard_metrics():
+    conn, lock = get_metrics_db()
+    with lock:
+        return dashboard_metrics(conn)
+
+@st.cache_resource
+def get_email_outbox():
+    # Starts the delivery worker, so mail queued before a restart goes out without visiting the Email page
+    return get_outbox()
+
+@st.cache_resource
+def get_ingest_state():
+    return {"last_ingest": get_scraper().last_ingest()}
 
-    prompt = f"""
-    Improve the following cover letter:
-    - Fix grammar, clarity, and formatting
-    - Improve flow and professionalism
-    - Remove repetition
-    - Keep all factual details
-    - Return ONLY the improved cover letter text.
+def ingest_version():
+    """Cache key for query results; every cached query takes it as its first argument."""
+    return get_ingest_state()["last_ingest"]
 
-    --- RAW COVER LETTER ---
-    {raw_text}
-    --- END ---
-    """
+@st.cache_data(show_spinner=False, max_entries=64)
+def query_saved_jobs(version, titles, collapse_duplicates, limit=100, order_by="created", descending=True, after=None):
+    return get_scraper().query_jobs(titles=titles, collapse_duplicates=collapse_duplicates, limit=limit,
+                                    order_by=order_by, descending=descending, after=after)
 
-    response = llm.invoke([HumanMessage(content=prompt)])
-    return response.text.strip()
+@st.cache_data(show_spinner=False, max_entries=64)
+def search_saved_jobs(version, keywords, limit=20):
+    return get_scraper().search_jobs(keywords, limit=limit)
 
+@st.cache_data(show_spinner=False, max_entries=16)
+def rank_saved_jobs(version, cv_text, top_k=20):
+    return get_scraper().rank_jobs_for_cv(cv_text, top_k=top_k)
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def read_uploaded_cv_text(data, extension):
+    temp_cv_path = f"temp_cv.{extension}"
+    with open(temp_cv_path, "wb") as f:
+        f.write(data)
+    return parse_cv(temp_cv_path).text
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_job(version, job_id):
+    return get_scraper().get_job(job_id)
+
+@st.cache_data(show_spinner=False, max_entries=256)
+def load_job_skills(version, job_id):
+    return get_scraper().get_job_skills(job_id)
 
 # --- Custom CSS for Styling ---
 def load_css():
@@ -147,6 +175,7 @@ def main():
         page_icon="💼"
     )
     # load_css()
+    get_email_outbox()
     
     # Sidebar navigation
     st.sidebar.title("💼 AI Job Assistant")
@@ -198,17 +227,38 @@ def render_dashboard():
     Get started by selecting a page from the sidebar.
     """)
     
+    # Every figure comes from the aggregate tables kept current at ingest and send time
+    metrics = read_dashboard_metrics()
+    applications = metrics["applications"]
+    pending = applications.get("queued", 0) + applications.get("sending", 0)
+
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Jobs Found", "25", "+5 from last week")
+        st.metric("Jobs Found", f"{metrics['jobs']:,}",
+                  f"{metrics['jobs_last_7_days'] - metrics['jobs_previous_7_days']:+,} posted vs. previous week")
     with col2:
-        st.metric("Applications Sent", "8", "3 pending")
+        st.metric("Applications Sent", applications.get("sent", 0), f"{pending} pending", delta_color="off")
     with col3:
-        st.metric("Interview Rate", "25%", "2 of 8")
+        average_salary = metrics["average_salary"]
+        st.metric("Average Salary", f"£{average_salary:,.0f}" if average_salary else "—",
+                  f"{applications.get('failed', 0)} failed sends", delta_color="off")
     
     st.markdown("---")
-    st.subheader("Recent Activity")
-    st.write("Your recent job application activity will appear here.")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.subheader("Top Companies")
+        if metrics["top_companies"]:
+            st.bar_chart(pd.DataFrame(metrics["top_companies"], columns=["company", "jobs"]).set_index("company"))
+        else:
+            st.write("Search for jobs to see which companies are hiring.")
+    with col2:
+        st.subheader("Salary Distribution")
+        if metrics["salary_histogram"]:
+            histogram = pd.DataFrame(metrics["salary_histogram"], columns=["salary (£k)", "jobs"])
+            histogram["salary (£k)"] //= 1000
+            st.bar_chart(histogram.set_index("salary (£k)"))
+        else:
+            st.write("No advertised salaries yet.")
 
 
 def render_job_search():
@@ -225,37 +275,159 @@ def render_job_search():
             )
         with col2:
             location = st.text_input("Location", "London")
+            max_pages = st.number_input(
+                "Pages per title",
+                min_value=1,
+                max_value=50,
+                value=1,
+                help="Number of result pages (50 jobs each) to fetch per job title"
+            )
+        hide_duplicates = st.checkbox(
+            "Hide near-duplicate postings",
+            value=True,
+            help="Show one listing for a role posted by several agencies"
+        )
     
     if st.button("Search Jobs", key="search_jobs"):
         with st.spinner("🔍 Searching for jobs..."):
             job_list = [title.strip() for title in job_titles.split(",")]
             
             try:
-                scraper = JobScraper(job_titles=job_list, location=location)
-                scraper.scrape_jobs()
-                jobs = scraper.get_saved_jobs()
-                
-                if not jobs.empty:
-                    st.session_state.job_results = jobs
-                    st.success(f"🎉 Found {len(jobs)} jobs!")
-                    
-                    # Display jobs in cards
-                    for idx, job in jobs.iterrows():
-                        with st.container():
-                            st.markdown(f"""
-                            <div class="job-card">
-                                <h3>{job['job_title']}</h3>
-                                <p><strong>Company:</strong> {job['company']}</p>
-                                <p><strong>Location:</strong> {job['location']}</p>
-                                <p><strong>Salary:</strong> £{job['salary_min']} - £{job['salary_max']}</p>
-                                <a href="{job['apply_link']}" target="_blank">View Job</a>
-                            </div>
-                            """, unsafe_allow_html=True)
-                else:
-                    st.warning("No jobs found. Try different search terms.")
+                scraper = get_scraper().with_search(job_list, location=location, max_pages=int(max_pages))
+                # Save each page as it arrives and report progress while the crawl continues
+                progress = st.empty()
+                fetched = 0
+                for page in scraper.iter_job_pages(concurrent=True):
+                    scraper.save_to_db(page)
+                    fetched += len(page)
+                    progress.info(f"Fetched {fetched} jobs so far...")
+                progress.empty()
+                get_ingest_state()["last_ingest"] = scraper.last_ingest()
+                st.session_state.job_search = {"titles": job_list, "collapse_duplicates": hide_duplicates}
+                st.session_state.result_cursors = [None]
+                st.success(f"🎉 Fetched {fetched} jobs!")
             except Exception as e:
                 st.error(f"Error searching for jobs: {str(e)}")
-                
+
+    if 'job_search' in st.session_state:
+        render_job_results()
+
+    st.markdown("---")
+    st.subheader("Search Saved Jobs")
+    keywords = st.text_input(
+        "Keywords",
+        placeholder="e.g. python fintech",
+        help="Full-text search over the titles, companies and descriptions of every saved job"
+    )
+    if keywords:
+        try:
+            matches = search_saved_jobs(ingest_version(), keywords)
+            if matches.empty:
+                st.info("No saved jobs match those keywords.")
+            for _, job in matches.iterrows():
+                with st.container():
+                    st.markdown(f"**{job['title']}** at {job['company']} ({job['location']})")
+                    st.markdown(job['snippet'])
+                    st.markdown(f"[View Job]({job['apply_link']})")
+        except Exception as e:
+            st.error(f"Error searching saved jobs: {str(e)}")
+
+    st.markdown("---")
+    st.subheader("Best Matches for Your CV")
+    ranking_cv = st.file_uploader(
+        "Upload your CV to rank saved jobs by fit",
+        type=['pdf', 'docx'],
+        key="ranking_cv"
+    )
+    if ranking_cv:
+        try:
+            cv_text = read_uploaded_cv_text(ranking_cv.getvalue(), ranking_cv.name.split('.')[-1])
+            matches = rank_saved_jobs(ingest_version(), cv_text)
+            if matches.empty:
+                st.info("No saved jobs match your CV yet. Search for jobs first.")
+            else:
+                # Lets the Cover Letter page pick from the best-fitting jobs
+                st.session_state.job_results = matches
+            for _, job in matches.iterrows():
+                with st.container():
+                    st.markdown(f"**{job['title']}** at {job['company']} ({job['location']}) · fit {job['score']:.0%}")
+                    if job['matched_skills']:
+                        st.markdown(f"Matched skills: {', '.join(job['matched_skills'])}")
+                    st.caption(f"Matched terms: {', '.join(job['matched_terms'])}")
+                    st.markdown(f"[View Job]({job['apply_link']})")
+        except Exception as e:
+            st.error(f"Error ranking jobs: {str(e)}")
+
+
+SORT_OPTIONS = {
+    "Newest first": ("created", True),
+    "Oldest first": ("created", False),
+    "Highest salary": ("salary_max", True),
+    "Lowest salary": ("salary_min", False),
+}
+
+def render_job_results():
+    """Renders one page of the current search, fetched from the database with a keyset cursor."""
+    search = st.session_state.job_search
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        page_size = st.selectbox("Jobs per page", [10, 25, 50], key="page_size")
+    with col2:
+        sort = st.selectbox("Sort by", list(SORT_OPTIONS), key="sort_order")
+    with col3:
+        view = st.radio("View", ["Cards", "Table"], horizontal=True, key="results_view")
+
+    # The cursor stack holds the start of every page visited so far; changing the
+    # page size or order starts again from the first page
+    if st.session_state.get("result_order") != (page_size, sort):
+        st.session_state.result_order = (page_size, sort)
+        st.session_state.result_cursors = [None]
+    cursors = st.session_state.result_cursors
+
+    order_by, descending = SORT_OPTIONS[sort]
+    jobs, next_cursor = query_saved_jobs(
+        ingest_version(), search["titles"], search["collapse_duplicates"],
+        limit=page_size, order_by=order_by, descending=descending, after=cursors[-1]
+    )
+    if jobs.empty:
+        st.warning("No jobs found. Try different search terms." if len(cursors) == 1 else "No more jobs.")
+    else:
+        st.session_state.job_results = jobs
+
+    if view == "Table":
+        st.dataframe(
+            jobs[["job_title", "company", "location", "salary_min", "salary_max", "created", "apply_link"]],
+            column_config={"apply_link": st.column_config.LinkColumn("Apply")},
+            hide_index=True,
+            use_container_width=True
+        )
+    else:
+        for _, job in jobs.iterrows():
+            with st.container():
+                st.markdown(f"""
+                <div class="job-card">
+                    <h3>{html.escape(str(job['job_title']))}</h3>
+                    <p><strong>{html.escape(str(job['company']))}</strong> · {html.escape(str(job['location']))}
+                    · £{job['salary_min']} - £{job['salary_max']}</p>
+                    <a href="{html.escape(str(job['apply_link']))}" target="_blank">View Job</a>
+                </div>
+                """, unsafe_allow_html=True)
+                # Descriptions are only fetched for the cards the user opens
+                if st.toggle("Show description", key=f"description_{job['id']}"):
+                    st.write(load_job(ingest_version(), int(job['id']))['description'])
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("← Previous", disabled=len(cursors) == 1, key="previous_page"):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if st.button("Next →", disabled=next_cursor is None, key="next_page"):
+            cursors.append(next_cursor)
+            st.rerun()
+
 
 def render_cover_letter_generator():
     st.title("Cover Letter Generator")
@@ -284,6 +456,11 @@ def render_cover_letter_generator():
                 st.markdown(f"**Posted:** {selected_job['created']}")
                 st.markdown(f"[Apply Here]({selected_job['apply_link']})")
             
+            # Search results leave descriptions out, so load the full listing on demand
+            if 'description' not in selected_job:
+                selected_job = load_job(ingest_version(), int(selected_job['id']))
+                st.session_state.selected_job = selected_job
+
             st.markdown("**Description:**")
             st.write(selected_job['description'][:500] + "...")
     else:
@@ -314,23 +491,31 @@ def render_cover_letter_generator():
                             selected_job['job_title'],
                             selected_job['company'],
                             selected_job['description'],
-                            temp_cv_path
+                            temp_cv_path,
+                            skills=load_job_skills(ingest_version(), int(selected_job['id']))
                         )
                         
-                        clean_letter = improve_cover_letter_with_gemini(cover_letter)
-                        st.session_state.cover_letter = clean_letter
-                        
-                        # Extract name from CV for saving files
-                        name, _ = extract_name_and_contact_from_cv(temp_cv_path)
-                        st.session_state.applicant_name = name
-                        
                         st.subheader("Your Custom Cover Letter")
-                        st.text_area(
+                        letter_placeholder = st.empty()
+                        # Show the polished letter as it is generated, then swap in the editable text area
+                        clean_letter = ""
+                        for chunk in stream_cover_letter_with_gemini(cover_letter):
+                            clean_letter += chunk
+                            letter_placeholder.text(clean_letter + "▌")
+                        clean_letter = clean_letter.strip()
+                        st.session_state.cover_letter = clean_letter
+                        letter_placeholder.text_area(
                             "Cover Letter Content",
                             clean_letter,
                             height=400,
                             label_visibility="collapsed"
                         )
+                        stats = llm_cache_stats()
+                        st.caption(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
+                        
+                        # Extract name from CV for saving files
+                        name, _ = extract_name_and_contact_from_cv(temp_cv_path)
+                        st.session_state.applicant_name = name
                         
                         # Save to files
                         if 'cover_letter_path' not in st.session_state:
@@ -340,6 +525,45 @@ def render_cover_letter_generator():
                             st.success("📄 Cover letter saved successfully!")
                     except Exception as e:
                         st.error(f"Error generating cover letter: {str(e)}")
+
+            st.subheader("Batch Mode")
+            batch_keys = st.multiselect(
+                "Generate letters for several jobs at once",
+                options=list(job_options.keys()),
+                help="Letters are polished concurrently and saved to generated_documents"
+            )
+            max_concurrency = st.slider("Concurrent requests", min_value=1, max_value=10, value=5)
+
+            if batch_keys and st.button("Generate Selected Cover Letters", key="generate_batch"):
+                scraper = get_scraper()
+                selected_ids = [int(st.session_state.job_results.iloc[job_options[key]]['id']) for key in batch_keys]
+                batch_jobs = scraper.get_jobs(selected_ids).to_dict('records')
+                for job in batch_jobs:
+                    job['skills'] = scraper.get_job_skills(job['id'])
+
+                progress = st.progress(0.0, text="Generating cover letters...")
+
+                def report_progress(done, total, result):
+                    status = "⚠️ failed" if result['error'] else "✅ done"
+                    progress.progress(done / total, text=f"{done}/{total}: {result['job_title']} at {result['company']} {status}")
+
+                start = time.time()
+                results = generate_cover_letters(batch_jobs, temp_cv_path, max_concurrency=max_concurrency,
+                                                 on_progress=report_progress)
+                name, _ = extract_name_and_contact_from_cv(temp_cv_path)
+                paths = save_cover_letters(results, name)
+                st.session_state.batch_cover_letters = results
+
+                failed = [result for result in results if result['error']]
+                st.success(f"📄 Generated {len(results) - len(failed)} cover letters in {time.time() - start:.1f}s")
+                for result in failed:
+                    st.warning(f"{result['job_title']} at {result['company']}: {result['error']}")
+                for result in results:
+                    if result['job_id'] in paths:
+                        with st.expander(f"{result['job_title']} at {result['company']}"):
+                            st.text_area("Cover Letter", result['cover_letter'], height=300,
+                                         key=f"batch_letter_{result['job_id']}", label_visibility="collapsed")
+                            st.caption(paths[result['job_id']])
                         
                         
                   
@@ -384,40 +608,46 @@ Best regards,
     )
     
     if st.button("Send Application", key="send_application"):
-        with st.spinner("📤 Sending your application..."):
-            try:
-                success = send_job_application_email(
-                    to_email=recipient_email,
-                    subject=email_subject,
-                    body=st.session_state.email_body,
-                    cv_path=st.session_state.cv_saved_path,
-                    cover_letter_path=st.session_state.cover_letter_path,
-                    # or, if you want the function to generate the cover letter:
-                    job_title=st.session_state.selected_job['job_title'],
-                    company=st.session_state.selected_job['company'],
-                    applicant_name=st.session_state.get('applicant_name')
-                )
-                
-                if success:
-                    st.success("🎉 Application sent successfully!")
-                    job_data = {  
-                        "job_title": st.session_state.selected_job['job_title'],
-                        "company": st.session_state.selected_job['company'],
-                        "location": st.session_state.selected_job.get('location', ''),
-                        "created": datetime.now().strftime("%Y-%m-%d"),
-                        "salary_min": st.session_state.selected_job.get('salary_min', ''),
-                        "salary_max": st.session_state.selected_job.get('salary_max', ''),
-                        "apply_link": st.session_state.selected_job.get('apply_link', ''),
-                        "status": "Applied",
-                        "application_date": datetime.now().strftime("%Y-%m-%d"),
-                        "interview_date": "",
-                        "notes": "Application sent via AI Job Assistant"
-                    }
-                    # update tracker code here...
-                else:
-                    st.error("Failed to send application. Check logs for details.")
-            except Exception as e:
-                st.error(f"Error sending application: {str(e)}")
+        try:
+            # Queue the email and return at once; the outbox worker delivers it and retries on failure
+            message_id = get_email_outbox().enqueue(
+                to_email=recipient_email,
+                subject=email_subject,
+                body=st.session_state.email_body,
+                cv_path=st.session_state.cv_saved_path,
+                cover_letter_path=st.session_state.cover_letter_path,
+                job_id=int(st.session_state.selected_job['id'])
+            )
+            st.session_state.outbox_message_id = message_id
+            if get_email_outbox().status(message_id)['status'] == "sent":
+                st.info("This application was already sent.")
+            else:
+                st.success("🎉 Application queued for sending!")
+            job_data = {  
+                "job_title": st.session_state.selected_job['job_title'],
+                "company": st.session_state.selected_job['company'],
+                "location": st.session_state.selected_job.get('location', ''),
+                "created": datetime.now().strftime("%Y-%m-%d"),
+                "salary_min": st.session_state.selected_job.get('salary_min', ''),
+                "salary_max": st.session_state.selected_job.get('salary_max', ''),
+                "apply_link": st.session_state.selected_job.get('apply_link', ''),
+                "status": "Applied",
+                "application_date": datetime.now().strftime("%Y-%m-%d"),
+                "interview_date": "",
+                "notes": "Application sent via AI Job Assistant"
+            }
+            # update tracker code here...
+        except Exception as e:
+            st.error(f"Error queueing application: {str(e)}")
+
+    if 'outbox_message_id' in st.session_state:
+        message = get_email_outbox().status(st.session_state.outbox_message_id)
+        if message is not None:
+            st.info(f"Latest application: **{message['status']}** after {message['attempts']} attempt(s)"
+                    + (f" — last error: {message['last_error']}" if message['last_error'] else ""))
+
+    with st.expander("📬 Outbox"):
+        st.dataframe(get_email_outbox().list_messages(limit=20), use_container_width=True)
                                   
                         
 if __name__ == "__main__":
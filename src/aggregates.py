@@ -0,0 +1,221 @@
+import sqlite3
+import argparse
+from datetime import date, timedelta
+from src.bulk_writer import configure_connection
+
+# Aggregate table -> (key column, expression computing the key from a jobs row, jobs column it depends on)
+JOB_DIMENSIONS = {
+    "agg_jobs_by_day": ("day", "COALESCE(substr({row}.created, 1, 10), '')", "created"),
+    "agg_jobs_by_title": ("title", "COALESCE({row}.title, '')", "title"),
+    "agg_jobs_by_company": ("company", "COALESCE({row}.company, '')", "company"),
+    "agg_jobs_by_location": ("location", "COALESCE({row}.location, '')", "location"),
+}
+SALARY_BUCKET_SIZE = 10000
+# Jobs advertising only one end of the range are bucketed by that end
+SALARY_MIDPOINT = "(COALESCE({row}.salary_min, {row}.salary_max) + COALESCE({row}.salary_max, {row}.salary_min)) / 2.0"
+SALARY_BUCKET = f"CAST({SALARY_MIDPOINT} / {SALARY_BUCKET_SIZE} AS INTEGER) * {SALARY_BUCKET_SIZE}"
+HAS_SALARY = "({row}.salary_min IS NOT NULL OR {row}.salary_max IS NOT NULL)"
+
+
+def _add(table, key_column, count_column, key, amount, condition="true"):
+    """SQL adding ``amount`` to the counter of ``key``, creating its row on first use."""
+    return (
+        f"INSERT INTO {table} ({key_column}, {count_column}) SELECT {key}, {amount} WHERE {condition} "
+        f"ON CONFLICT({key_column}) DO UPDATE SET {count_column} = {count_column} + excluded.{count_column};"
+    )
+
+
+def _prune(table, key_column, count_column, key):
+    """SQL dropping the row of ``key`` once its counter reaches zero."""
+    return f"DELETE FROM {table} WHERE {key_column} = {key} AND {count_column} <= 0;"
+
+
+def _job_changes(row, sign):
+    """SQL statements applying one jobs row to every job aggregate, counted with ``sign`` (1 or -1)."""
+    statements = []
+    for table, (key_column, key, _) in JOB_DIMENSIONS.items():
+        statements.append(_add(table, key_column, "jobs", key.format(row=row), sign))
+        if sign < 0:
+            statements.append(_prune(table, key_column, "jobs", key.format(row=row)))
+    statements.extend(_salary_changes(row, sign))
+    statements.append(_add("agg_totals", "name", "value", "'jobs'", sign))
+    return statements
+
+
+def _salary_changes(row, sign):
+    has_salary = HAS_SALARY.format(row=row)
+    statements = [
+        _add("agg_salary_histogram", "bucket", "jobs", SALARY_BUCKET.format(row=row), sign, has_salary),
+        _add("agg_totals", "name", "value", "'salary_jobs'", sign, has_salary),
+        _add("agg_totals", "name", "value", "'salary_sum'", f"{sign} * {SALARY_MIDPOINT.format(row=row)}", has_salary),
+    ]
+    if sign < 0:
+        statements.append(_prune("agg_salary_histogram", "bucket", "jobs", SALARY_BUCKET.format(row=row)))
+    return statements
+
+
+def _trigger(name, event, statements, when=None):
+    body = "\n        ".join(statements)
+    return f"""
+    CREATE TRIGGER IF NOT EXISTS {name} {event}
+    {f"WHEN {when}" if when else ""}
+    BEGIN
+        {body}
+    END
+    """
+
+
+def create_job_aggregates(conn):
+    """Creates the aggregate tables and the triggers on jobs that keep them up to date."""
+    for table, (key_column, _, _) in JOB_DIMENSIONS.items():
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} ({key_column} TEXT PRIMARY KEY, jobs INTEGER NOT NULL)")
+        # Serves the "top N" reads without sorting the table
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_jobs ON {table}(jobs)")
+    conn.execute("CREATE TABLE IF NOT EXISTS agg_salary_histogram (bucket INTEGER PRIMARY KEY, jobs INTEGER NOT NULL)")
+    conn.execute("CREATE TABLE IF NOT EXISTS agg_totals (name TEXT PRIMARY KEY, value REAL NOT NULL)")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS agg_applications_by_status (status TEXT PRIMARY KEY, messages INTEGER NOT NULL)"
+    )
+
+    conn.execute(_trigger("jobs_agg_insert", "AFTER INSERT ON jobs", _job_changes("new", 1)))
+    conn.execute(_trigger("jobs_agg_delete", "AFTER DELETE ON jobs", _job_changes("old", -1)))
+    # Re-saving a listing rewrites every column, so each trigger only fires when its own column really changed
+    for table, (key_column, key, column) in JOB_DIMENSIONS.items():
+        conn.execute(_trigger(
+            f"jobs_agg_update_{column}",
+            f"AFTER UPDATE OF {column} ON jobs",
+            [
+                _add(table, key_column, "jobs", key.format(row="old"), -1),
+                _prune(table, key_column, "jobs", key.format(row="old")),
+                _add(table, key_column, "jobs", key.format(row="new"), 1),
+            ],
+            when=f"old.{column} IS NOT new.{column}"
+        ))
+    conn.execute(_trigger(
+        "jobs_agg_update_salary",
+        "AFTER UPDATE OF salary_min, salary_max ON jobs",
+        _salary_changes("old", -1) + _salary_changes("new", 1),
+        when="old.salary_min IS NOT new.salary_min OR old.salary_max IS NOT new.salary_max"
+    ))
+
+
+def create_application_aggregates(conn):
+    """Adds the triggers counting outbox messages by status; run once the email_outbox table exists."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'outbox_agg_insert'"
+    ).fetchone()
+    if exists:
+        return
+
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS agg_applications_by_status (status TEXT PRIMARY KEY, messages INTEGER NOT NULL)"
+    )
+    conn.execute(_trigger("outbox_agg_insert", "AFTER INSERT ON email_outbox", [
+        _add("agg_applications_by_status", "status", "messages", "new.status", 1),
+    ]))
+    conn.execute(_trigger("outbox_agg_delete", "AFTER DELETE ON email_outbox", [
+        _add("agg_applications_by_status", "status", "messages", "old.status", -1),
+        _prune("agg_applications_by_status", "status", "messages", "old.status"),
+    ]))
+    conn.execute(_trigger("outbox_agg_update_status", "AFTER UPDATE OF status ON email_outbox", [
+        _add("agg_applications_by_status", "status", "messages", "old.status", -1),
+        _prune("agg_applications_by_status", "status", "messages", "old.status"),
+        _add("agg_applications_by_status", "status", "messages", "new.status", 1),
+    ], when="old.status IS NOT new.status"))
+    rebuild_application_aggregates(conn)
+
+
+def rebuild_job_aggregates(conn):
+    """Recomputes every job aggregate from the jobs table."""
+    for table, (key_column, key, _) in JOB_DIMENSIONS.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(
+            f"INSERT INTO {table} ({key_column}, jobs) SELECT {key.format(row='jobs')}, COUNT(*) FROM jobs GROUP BY 1"
+        )
+    conn.execute("DELETE FROM agg_salary_histogram")
+    conn.execute(
+        f"INSERT INTO agg_salary_histogram (bucket, jobs) SELECT {SALARY_BUCKET.format(row='jobs')}, COUNT(*) "
+        f"FROM jobs WHERE {HAS_SALARY.format(row='jobs')} GROUP BY 1"
+    )
+    conn.execute("DELETE FROM agg_totals")
+    conn.execute(
+        f"""
+        INSERT INTO agg_totals (name, value)
+        SELECT 'jobs', COUNT(*) FROM jobs
+        UNION ALL
+        SELECT 'salary_jobs', COUNT(*) FROM jobs WHERE {HAS_SALARY.format(row='jobs')}
+        UNION ALL
+        SELECT 'salary_sum', COALESCE(SUM({SALARY_MIDPOINT.format(row='jobs')}), 0)
+        FROM jobs WHERE {HAS_SALARY.format(row='jobs')}
+        """
+    )
+
+
+def rebuild_application_aggregates(conn):
+    """Recomputes the application counts from the outbox, if there is one."""
+    conn.execute("DELETE FROM agg_applications_by_status")
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'email_outbox'").fetchone():
+        conn.execute(
+            "INSERT INTO agg_applications_by_status (status, messages) "
+            "SELECT status, COUNT(*) FROM email_outbox GROUP BY status"
+        )
+
+
+def rebuild_aggregates(conn):
+    """Recomputes all aggregate tables from scratch in one transaction."""
+    with conn:
+        create_job_aggregates(conn)
+        rebuild_job_aggregates(conn)
+        rebuild_application_aggregates(conn)
+
+
+def _top(conn, table, key_column, limit):
+    return conn.execute(
+        f"SELECT {key_column}, jobs FROM {table} WHERE {key_column} != '' ORDER BY jobs DESC LIMIT ?", (limit,)
+    ).fetchall()
+
+
+def dashboard_metrics(conn, today=None, top=5):
+    """Reads the dashboard figures from the aggregate tables; every query touches only a few rows.
+
+    Returns a dict with the total number of jobs, the jobs posted in the last
+    seven days and the seven before, the average advertised salary, the
+    application counts by outbox status, the salary histogram and the top
+    companies, titles and locations.
+    """
+    today = today or date.today()
+    totals = dict(conn.execute("SELECT name, value FROM agg_totals").fetchall())
+
+    def posted_between(start, end):
+        return conn.execute(
+            "SELECT COALESCE(SUM(jobs), 0) FROM agg_jobs_by_day WHERE day >= ? AND day < ?",
+            (start.isoformat(), end.isoformat())
+        ).fetchone()[0]
+
+    tomorrow = today + timedelta(days=1)
+    salary_jobs = totals.get("salary_jobs", 0)
+    return {
+        "jobs": int(totals.get("jobs", 0)),
+        "jobs_last_7_days": posted_between(tomorrow - timedelta(days=7), tomorrow),
+        "jobs_previous_7_days": posted_between(tomorrow - timedelta(days=14), tomorrow - timedelta(days=7)),
+        "average_salary": totals.get("salary_sum", 0) / salary_jobs if salary_jobs else None,
+        "applications": dict(conn.execute("SELECT status, messages FROM agg_applications_by_status").fetchall()),
+        "salary_histogram": conn.execute("SELECT bucket, jobs FROM agg_salary_histogram ORDER BY bucket").fetchall(),
+        "top_companies": _top(conn, "agg_jobs_by_company", "company", top),
+        "top_titles": _top(conn, "agg_jobs_by_title", "title", top),
+        "top_locations": _top(conn, "agg_jobs_by_location", "location", top),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain the dashboard aggregate tables.")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every aggregate from scratch")
+    parser.add_argument("--db", default="jobs.db", help="SQLite database (default: jobs.db)")
+    args = parser.parse_args()
+
+    conn = configure_connection(sqlite3.connect(args.db))
+    if args.rebuild:
+        rebuild_aggregates(conn)
+        print("✅ Aggregates rebuilt.")
+    for name, value in dashboard_metrics(conn).items():
+        print(f"{name}: {value}")
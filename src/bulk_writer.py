@@ -0,0 +1,54 @@
+import time
+from operator import itemgetter
+
+# Write-ahead logging lets Streamlit readers keep querying while a crawl is writing
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # Safe with WAL; fsync only at checkpoints
+    "cache_size": -64000,  # Negative values are in KiB, so about 64 MB of page cache
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+    "busy_timeout": 5000,  # Milliseconds to wait for another writer instead of failing
+}
+
+
+def configure_connection(conn, pragmas=None):
+    """Applies the WAL journal mode and tuned pragmas to a SQLite connection."""
+    for name, value in (pragmas or PRAGMAS).items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+class BulkWriter:
+    """Writes batches of rows with one prepared statement and one transaction per batch.
+
+    - conn: SQLite connection to write to
+    - query: INSERT statement with one positional placeholder per column
+    - columns: keys read from each row dict, in placeholder order
+    """
+
+    def __init__(self, conn, query, columns):
+        self.conn = conn
+        self.query = query
+        self.row_values = itemgetter(*columns)
+        self.total_rows = 0
+        self.total_seconds = 0.0
+        self.last_rate = 0.0
+
+    def write(self, rows):
+        """Writes the rows in a single transaction and returns how many were written."""
+        start = time.perf_counter()
+        with self.conn:
+            self.conn.executemany(self.query, map(self.row_values, rows))
+        elapsed = time.perf_counter() - start
+
+        count = len(rows)
+        self.total_rows += count
+        self.total_seconds += elapsed
+        self.last_rate = count / elapsed if elapsed else 0.0
+        return count
+
+    @property
+    def rows_per_sec(self):
+        """Average write throughput across every batch written so far."""
+        return self.total_rows / self.total_seconds if self.total_seconds else 0.0
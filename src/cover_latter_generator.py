@@ -1,37 +1,38 @@
 import os
-import PyPDF2
-from docx import Document
+import re
+import asyncio
 from src.nlp_processing import extract_skills_from_description
+from src.cv_parser import parse_cv, extract_experience_from_text, extract_name_and_contact_from_text
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.base import MIMEBase
 from email import encoders
-from dotenv import load_dotenv
 import json
-from langchain_groq import ChatGroq
-from langchain_core.prompts import PromptTemplate
+from src.env import load_env
+from src.lazy import lazy_resource
+from src.llm_client import aimprove_cover_letter_with_gemini
 
 
+@lazy_resource
+def get_llm():
+    """Returns the shared Groq chat client, creating it on first use."""
+    from langchain_groq import ChatGroq
 
+    load_env()
+    return ChatGroq(model="llama3-8b-8192", groq_api_key=os.getenv("GROQ_API_KEY"))
 
-# Load the .env file
-load_dotenv(dotenv_path=r"C:\Users\nagar\Desktop\my_project\job_automate\JobPilot\gmail.env")
-load_dotenv()
 
-llm = ChatGroq(model="llama3-8b-8192", groq_api_key=os.getenv("GROQ_API_KEY"))
-
-
-def generate_cover_letter(job_title, company, job_desc, cv_file_path):
-    # Extract skills from job description
-    skills = extract_skills_from_description(job_desc)
+def generate_cover_letter(job_title, company, job_desc, cv_file_path, skills=None):
+    # Use the skills stored at ingest time when given, otherwise extract them from the description
+    if skills is None:
+        skills = extract_skills_from_description(job_desc)
     
-    # Extract relevant experience from CV
-    experience = extract_experience_from_cv(cv_file_path)
-
-    # Extract name and contact info from the CV
-    name, contact_info = extract_name_and_contact_from_cv(cv_file_path)
+    # Parse the CV once (or reuse the cached parse) for experience, name and contact info
+    cv = parse_cv(cv_file_path)
+    experience = cv.experience
+    name, contact_info = cv.name, cv.contact_info
 
     # Create the cover letter template
     cover_letter = f"""
@@ -53,63 +54,58 @@ def generate_cover_letter(job_title, company, job_desc, cv_file_path):
     
     return cover_letter
 
-# Helper functions for extracting information from CV
-def extract_experience_from_cv(cv_file_path):
-    experience = ""
-
-    if cv_file_path.lower().endswith('.pdf'):
-        with open(cv_file_path, 'rb') as cv_file:
-            reader = PyPDF2.PdfReader(cv_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-        experience = extract_experience_from_text(text)
-
-    elif cv_file_path.lower().endswith('.docx'):
-        doc = Document(cv_file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        experience = extract_experience_from_text(text)
-
-    return experience
+async def agenerate_cover_letters(jobs, cv_file_path, max_concurrency=5, timeout=60, on_progress=None):
+    """Generates and polishes cover letters for several jobs, polishing up to max_concurrency at a time.
 
-def extract_experience_from_text(text):
-    experience_section = ""
-    experience_keywords = ['experience', 'work', 'role', 'responsibilities']
+    - jobs: dicts (or rows) with id, job_title, company, description and optionally skills
+    - timeout: seconds allowed for each polishing call
+    - on_progress: called as on_progress(done, total, result) each time a letter completes
 
-    for line in text.split('\n'):
-        for keyword in experience_keywords:
-            if keyword in line.lower():
-                experience_section += line.strip() + "\n"
-                break
-
-    return experience_section
+    Returns one result dict per job, in the order of jobs, with job_id, job_title,
+    company, cover_letter and error. A letter whose polishing failed keeps the
+    unpolished template text and records the error.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def generate(job):
+        result = {"job_id": job["id"], "job_title": job["job_title"], "company": job["company"],
+                  "cover_letter": None, "error": None}
+        try:
+            # Template filling is local and fast; the CV is parsed once and then served from the cache
+            result["cover_letter"] = generate_cover_letter(
+                job["job_title"], job["company"], job["description"] or "", cv_file_path, skills=job.get("skills")
+            )
+            async with semaphore:
+                result["cover_letter"] = await aimprove_cover_letter_with_gemini(result["cover_letter"], timeout)
+        except asyncio.TimeoutError:
+            result["error"] = f"Polishing timed out after {timeout} seconds"
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    jobs = list(jobs)
+    results = {}
+    for done, task in enumerate(asyncio.as_completed([generate(job) for job in jobs]), start=1):
+        result = await task
+        results[result["job_id"]] = result
+        if on_progress:
+            on_progress(done, len(jobs), result)
+    return [results[job["id"]] for job in jobs]
+
+
+def generate_cover_letters(jobs, cv_file_path, max_concurrency=5, timeout=60, on_progress=None):
+    """Blocking wrapper around agenerate_cover_letters for callers without an event loop."""
+    return asyncio.run(agenerate_cover_letters(jobs, cv_file_path, max_concurrency, timeout, on_progress))
+
+
+# Helper functions for extracting information from CV; both read the cached parse of the file
+def extract_experience_from_cv(cv_file_path):
+    return parse_cv(cv_file_path).experience
 
 
 def extract_name_and_contact_from_cv(cv_file_path):
-    name = ""
-    contact_info = ""
-
-    if cv_file_path.lower().endswith('.pdf'):
-        with open(cv_file_path, 'rb') as cv_file:
-            reader = PyPDF2.PdfReader(cv_file)
-            text = ""
-            for page in reader.pages:
-                text += page.extract_text()
-        name, contact_info = extract_name_and_contact_from_text(text)
-
-    elif cv_file_path.lower().endswith('.docx'):
-        doc = Document(cv_file_path)
-        text = "\n".join([para.text for para in doc.paragraphs])
-        name, contact_info = extract_name_and_contact_from_text(text)
-
-    return name, contact_info
-
-def extract_name_and_contact_from_text(text):
-    lines = text.split("\n")
-    name = lines[0] if len(lines) > 0 else "Your Full Name"
-    contact_info = lines[1] if len(lines) > 1 else "Your Contact Information"
-    
-    return name, contact_info
+    cv = parse_cv(cv_file_path)
+    return cv.name, cv.contact_info
 
 # Save the CV and Cover Letter to Files
 def save_to_files(cv_file, cover_letter, name):
@@ -128,8 +124,27 @@ def save_to_files(cv_file, cover_letter, name):
 
     return os.path.join(output_dir, cover_letter_filename), os.path.join(output_dir, cv_filename)
 
+def save_cover_letters(results, name, output_dir="generated_documents"):
+    """Writes one file per generated letter, named after the applicant, company and job id.
+
+    Returns a dict mapping each job id to its file path; results without a letter are skipped.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    paths = {}
+    for result in results:
+        if not result["cover_letter"]:
+            continue
+        company = re.sub(r"[^\w-]+", "_", str(result["company"] or "company")).strip("_")
+        path = os.path.join(output_dir, f"Cover_letter_{name}_{company}_{result['job_id']}.txt")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(result["cover_letter"])
+        paths[result["job_id"]] = path
+    return paths
+
 # Function to send email with CV and Cover Letter as attachments
 def send_email(subject, body, recipient, cv_path, cover_letter_path):
+    load_env()
     msg = MIMEMultipart()
     msg['From'] = os.getenv('EMAIL_USER')
     msg['To'] = recipient
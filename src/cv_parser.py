@@ -0,0 +1,234 @@
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+
+CV_CACHE_DIR = os.path.join("cache", "cv")
+# Bump when parsing changes so stale cache files are ignored
+CV_PARSER_VERSION = 2
+# PDFs with at least this many pages are extracted on a process pool
+PARALLEL_PAGE_THRESHOLD = 16
+
+SECTION_HEADINGS = {
+    "summary": ["summary", "profile", "professional summary", "about me", "objective"],
+    "experience": ["experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history"],
+    "education": ["education", "academic background", "qualifications"],
+    "skills": ["skills", "technical skills", "core skills", "key skills"],
+    "projects": ["projects", "personal projects"],
+    "publications": ["publications", "research"],
+    "certifications": ["certifications", "certificates", "courses"],
+}
+_HEADING_LOOKUP = {alias: section for section, aliases in SECTION_HEADINGS.items() for alias in aliases}
+
+
+@dataclass
+class ParsedCV:
+    """Everything the cover letter helpers need from a CV, extracted in a single parse."""
+    content_hash: str
+    text: str
+    sections: dict
+    name: str
+    contact_info: str
+    experience: str
+
+
+def extract_experience_from_text(text):
+    experience_lines = []
+    experience_keywords = ['experience', 'work', 'role', 'responsibilities']
+
+    for line in text.split('\n'):
+        for keyword in experience_keywords:
+            if keyword in line.lower():
+                experience_lines.append(line.strip() + "\n")
+                break
+
+    return "".join(experience_lines)
+
+
+def extract_name_and_contact_from_text(text):
+    lines = text.split("\n")
+    name = lines[0] if len(lines) > 0 else "Your Full Name"
+    contact_info = lines[1] if len(lines) > 1 else "Your Contact Information"
+
+    return name, contact_info
+
+
+def split_sections(lines):
+    """Splits CV lines into sections keyed by their normalized heading; lines above the first heading are "header".
+
+    Accepts any iterable of lines and consumes it lazily, one line at a time.
+    """
+    sections = {"header": []}
+    current = "header"
+    for line in lines:
+        heading = re.sub(r"[^a-z ]", "", line.lower()).strip()
+        if heading in _HEADING_LOOKUP:
+            current = _HEADING_LOOKUP[heading]
+            sections.setdefault(current, [])
+        else:
+            sections[current].append(line)
+    return {section: "\n".join(section_lines).strip() for section, section_lines in sections.items()}
+
+
+def _extract_page_range(args):
+    """Process-pool worker: extracts the text of pages [start, stop) of a PDF."""
+    import PyPDF2
+
+    pdf_path, start, stop = args
+    reader = PyPDF2.PdfReader(pdf_path)
+    return [reader.pages[index].extract_text() or "" for index in range(start, stop)]
+
+
+def iter_pdf_pages(pdf_path, max_workers=None, parallel_threshold=PARALLEL_PAGE_THRESHOLD):
+    """Yields the text of each PDF page in order.
+
+    Short documents are extracted page by page in this process, only as fast as
+    the caller consumes them. Documents with at least ``parallel_threshold``
+    pages are split into page ranges extracted on a process pool, and the
+    pages are still yielded in order as each range completes.
+    """
+    import PyPDF2
+
+    reader = PyPDF2.PdfReader(pdf_path)
+    page_count = len(reader.pages)
+    workers = min(max_workers or os.cpu_count() or 1, page_count)
+    if page_count < parallel_threshold or workers < 2:
+        for page in reader.pages:
+            yield page.extract_text() or ""
+        return
+
+    # A few ranges per worker keeps the pool busy when pages differ in cost
+    chunk_size = max(1, -(-page_count // (workers * 4)))
+    ranges = [(pdf_path, start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for pages in executor.map(_extract_page_range, ranges):
+            yield from pages
+
+
+def iter_cv_pages(cv_file_path):
+    """Yields the text of a PDF page by page, or of a DOCX paragraph by paragraph; None for other file types."""
+    if cv_file_path.lower().endswith('.pdf'):
+        return iter_pdf_pages(cv_file_path)
+
+    if cv_file_path.lower().endswith('.docx'):
+        from docx import Document
+
+        doc = Document(cv_file_path)
+        return (para.text for para in doc.paragraphs)
+
+    return None
+
+
+def iter_lines(pages):
+    """Lazily splits a stream of page texts into lines."""
+    for page in pages:
+        yield from page.split("\n")
+
+
+def read_cv_text(cv_file_path):
+    """Returns the plain text of a PDF or DOCX CV, or None for other file types."""
+    pages = iter_cv_pages(cv_file_path)
+    if pages is None:
+        return None
+    # Collect the pieces and join once rather than growing a string page by page
+    return "\n".join(pages)
+
+
+class CVCache:
+    """Parsed CVs keyed by the SHA-256 of the file contents, kept in memory and as JSON files on disk.
+
+    - cache_dir: directory for the JSON files, or None to cache in memory only
+    - max_in_memory: number of parsed CVs kept in memory, least recently used evicted first
+    """
+
+    def __init__(self, cache_dir=CV_CACHE_DIR, max_in_memory=16):
+        self.cache_dir = cache_dir
+        self.max_in_memory = max_in_memory
+        self._parsed = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}-v{CV_PARSER_VERSION}.json")
+
+    def get(self, cv_file_path):
+        """Returns the ParsedCV for a file, parsing it only if these exact contents were never seen."""
+        with open(cv_file_path, 'rb') as f:
+            content_hash = hashlib.sha256(f.read()).hexdigest()
+        # The extension picks the parser, so identical bytes under another type parse separately
+        key = f"{content_hash}-{os.path.splitext(cv_file_path)[1].lower().lstrip('.') or 'none'}"
+
+        with self._lock:
+            if key in self._parsed:
+                self._parsed.move_to_end(key)
+                return self._parsed[key]
+
+        parsed = self._load(key)
+        if parsed is None:
+            parsed = self._parse(cv_file_path, content_hash)
+            self._store(key, parsed)
+
+        with self._lock:
+            self._parsed[key] = parsed
+            self._parsed.move_to_end(key)
+            while len(self._parsed) > self.max_in_memory:
+                self._parsed.popitem(last=False)
+        return parsed
+
+    def _parse(self, cv_file_path, content_hash):
+        pages = iter_cv_pages(cv_file_path)
+        if pages is None:
+            # Unsupported file type: nothing can be extracted
+            return ParsedCV(content_hash, "", {}, "", "", "")
+
+        lines = []
+
+        def collect_lines():
+            for line in iter_lines(pages):
+                lines.append(line)
+                yield line
+
+        # Pages are extracted only as the section parser asks for more lines
+        sections = split_sections(collect_lines())
+        text = "\n".join(lines)
+        name, contact_info = extract_name_and_contact_from_text(text)
+        return ParsedCV(
+            content_hash=content_hash,
+            text=text,
+            sections=sections,
+            name=name,
+            contact_info=contact_info,
+            experience=extract_experience_from_text(text),
+        )
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), encoding="utf-8") as f:
+                return ParsedCV(**json.load(f))
+        except (OSError, ValueError, TypeError):
+            return None
+
+    def _store(self, key, parsed):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._disk_path(key)
+        # Write then rename so a concurrent reader never sees a half-written file
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(asdict(parsed), f)
+        os.replace(temp_path, path)
+
+
+_default_cache = CVCache()
+
+
+def parse_cv(cv_file_path):
+    """Returns the parsed CV for a file from the shared process-wide cache."""
+    return _default_cache.get(cv_file_path)
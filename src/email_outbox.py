@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import pandas as pd
+from src.bulk_writer import configure_connection
+from src.rate_limiter import backoff_delay
+from src.aggregates import create_application_aggregates
+
+# Statuses a message moves through; "sending" rows left by a crash are queued again on startup
+QUEUED, SENDING, SENT, FAILED = "queued", "sending", "sent", "failed"
+# Copies of queued attachments, one directory per content hash, so later edits to the originals do not leak in
+OUTBOX_ATTACHMENT_DIR = os.path.join("cache", "outbox")
+
+
+class PermanentSendError(Exception):
+    """A message that can never be delivered as queued, such as one with a missing attachment."""
+
+
+class EmailOutbox:
+    """Persistent queue of outgoing application emails, delivered by a background worker.
+
+    - db_name: SQLite file holding the outbox table; the jobs database by default
+    - max_attempts: deliveries tried before a message is marked failed
+    - retry_base / retry_cap: seconds for the jittered exponential backoff between attempts
+    - poll_interval: seconds the idle worker sleeps before checking for due retries
+    - attachment_dir: where the attachments of queued messages are copied
+
+    Attachments are copied when a message is enqueued, so the email carries
+    the files as they were then, whatever happens to the originals before
+    delivery. Every message carries an idempotency key: enqueueing the same
+    key twice returns the existing message instead of sending a second
+    email, and the key is used as the Message-ID so a retried delivery can
+    be recognized. A message that failed is queued again, with fresh
+    attempts, when it is enqueued once more.
+    """
+
+    def __init__(self, db_name="jobs.db", max_attempts=5, retry_base=30.0, retry_cap=30 * 60.0,
+                 poll_interval=5.0, attachment_dir=OUTBOX_ATTACHMENT_DIR):
+        self.max_attempts = max_attempts
+        self.attachment_dir = attachment_dir
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._worker = None
+
+        # Shared by the page and the worker thread; every use is serialized through self._lock
+        self.conn = configure_connection(sqlite3.connect(db_name, check_same_thread=False))
+        with self.conn:
+            self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                recipients TEXT NOT NULL,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                cv_path TEXT NOT NULL,
+                cover_letter_path TEXT,
+                job_id INTEGER,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                sent_at REAL
+            )
+            ''')
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_email_outbox_due ON email_outbox(status, next_attempt_at)"
+            )
+            self.conn.execute(
+                "UPDATE email_outbox SET status = ?, updated_at = ? WHERE status = ?", (QUEUED, time.time(), SENDING)
+            )
+            # Keeps the dashboard's applications-by-status counts current
+            create_application_aggregates(self.conn)
+
+    @staticmethod
+    def make_idempotency_key(recipients, subject, body, cv_path, cover_letter_path, job_id=None):
+        """Derives a key from the message contents, so resubmitting the same application is a no-op."""
+        encoded = json.dumps([sorted(recipients), subject, body, cv_path, cover_letter_path, job_id])
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def _snapshot(self, path):
+        """Copies an attachment under its content hash and returns the copy's path.
+
+        The copy keeps the file name, which becomes the attachment name. A file
+        that cannot be read is left as given, so delivery reports it.
+        """
+        if not path:
+            return path
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return path
+        directory = os.path.join(self.attachment_dir, hashlib.sha256(data).hexdigest())
+        snapshot = os.path.join(directory, os.path.basename(path))
+        if not os.path.exists(snapshot):
+            os.makedirs(directory, exist_ok=True)
+            # Write then rename so the worker never attaches a half-written file
+            temp_path = f"{snapshot}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, snapshot)
+        return snapshot
+
+    def _release_attachments(self, message_id):
+        """Deletes the copied attachments of a sent message that no unsent message still uses."""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT cv_path, cover_letter_path FROM email_outbox WHERE id = ?", (message_id,)
+            ).fetchone()
+            unused = []
+            for path in dict.fromkeys(row or ()):
+                # Only the copies made by _snapshot are ours to delete
+                if not path or os.path.dirname(os.path.dirname(path)) != self.attachment_dir:
+                    continue
+                in_use = self.conn.execute(
+                    "SELECT 1 FROM email_outbox WHERE status != ? AND (cv_path = ? OR cover_letter_path = ?) LIMIT 1",
+                    (SENT, path, path)
+                ).fetchone()
+                if not in_use:
+                    unused.append(path)
+        for path in unused:
+            try:
+                os.remove(path)
+                os.rmdir(os.path.dirname(path))
+            except OSError:
+                # Already gone, or the directory still holds the same contents under another name
+                pass
+
+    def enqueue(self, to_email, subject, body, cv_path, cover_letter_path=None, job_id=None,
+                idempotency_key=None):
+        """Stores a message for delivery and returns its id at once; the worker sends it in the background.
+
+        Resubmitting a queued or sent message is a no-op; resubmitting a failed one retries it from scratch.
+        The key is derived from the attachment contents, so the same path holding a new CV is a new message.
+        """
+        recipients = list(to_email) if isinstance(to_email, (list, tuple)) else [to_email]
+        cv_path = self._snapshot(cv_path)
+        cover_letter_path = self._snapshot(cover_letter_path)
+        key = idempotency_key or self.make_idempotency_key(
+            recipients, subject, body, cv_path, cover_letter_path, job_id
+        )
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                INSERT INTO email_outbox
+                    (idempotency_key, recipients, subject, body, cv_path, cover_letter_path, job_id,
+                     status, next_attempt_at, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(idempotency_key) DO UPDATE SET
+                    status = excluded.status, attempts = 0, last_error = NULL,
+                    next_attempt_at = excluded.next_attempt_at, updated_at = excluded.updated_at
+                WHERE email_outbox.status = ?
+                """,
+                (key, json.dumps(recipients), subject, body, cv_path, cover_letter_path, job_id,
+                 QUEUED, now, now, now, FAILED)
+            )
+            message_id = self.conn.execute(
+                "SELECT id FROM email_outbox WHERE idempotency_key = ?", (key,)
+            ).fetchone()[0]
+        self._wake.set()
+        return message_id
+
+    def status(self, message_id):
+        """Returns the delivery state of a message as a dict, or None if it does not exist."""
+        with self._lock:
+            row = self.conn.execute(
+                """
+                SELECT id, recipients, subject, status, attempts, last_error, created_at, sent_at, next_attempt_at
+                FROM email_outbox WHERE id = ?
+                """,
+                (message_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "recipients", "subject", "status", "attempts", "last_error", "created_at", "sent_at",
+                "next_attempt_at")
+        message = dict(zip(keys, row))
+        message["recipients"] = json.loads(message["recipients"])
+        return message
+
+    def list_messages(self, status=None, limit=50):
+        """Returns the most recent messages, optionally with one status, as a DataFrame."""
+        query = """
+        SELECT id, recipients, subject, status, attempts, last_error,
+               datetime(created_at, 'unixepoch') AS created, datetime(sent_at, 'unixepoch') AS sent
+        FROM email_outbox
+        """
+        params = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            return pd.read_sql(query, self.conn, params=params)
+
+    def _claim_next(self):
+        """Marks the next due message as sending and returns it, or None if nothing is due."""
+        now = time.time()
+        with self._lock, self.conn:
+            row = self.conn.execute(
+                """
+                SELECT id, idempotency_key, recipients, subject, body, cv_path, cover_letter_path, attempts
+                FROM email_outbox
+                WHERE status = ? AND next_attempt_at <= ?
+                ORDER BY next_attempt_at LIMIT 1
+                """,
+                (QUEUED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute(
+                "UPDATE email_outbox SET status = ?, attempts = attempts + 1, updated_at = ? WHERE id = ?",
+                (SENDING, now, row[0])
+            )
+        return row
+
+    def _finish(self, message_id, status, error=None, retry_in=None):
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                """
+                UPDATE email_outbox
+                SET status = ?, last_error = ?, updated_at = ?,
+                    sent_at = CASE WHEN ? = 'sent' THEN ? ELSE sent_at END,
+                    next_attempt_at = ?
+                WHERE id = ?
+                """,
+                (status, error, now, status, now, now + (retry_in or 0), message_id)
+            )
+
+    def _deliver(self, idempotency_key, recipients, subject, body, cv_path, cover_letter_path):
+        """Sends one message over the pooled SMTP sessions."""
+        from src.email_sender import build_application_message, get_smtp_pool, load_smtp_settings
+
+        settings = load_smtp_settings()
+        if settings is None:
+            # Retried with backoff: the credentials may be set before the next attempt
+            raise ValueError("Email credentials are not set properly in environment variables.")
+        if not cover_letter_path:
+            raise PermanentSendError("No cover letter attached")
+        try:
+            msg = build_application_message(settings[0], recipients, subject, body, cv_path, cover_letter_path)
+        except OSError as e:
+            raise PermanentSendError(f"Attachment could not be read: {e}")
+        msg['Message-ID'] = f"<{idempotency_key}@jobpilot>"
+        get_smtp_pool().sendmail(settings[0], recipients, msg.as_string())
+
+    def process_next(self):
+        """Delivers the next due message; returns False when nothing was due."""
+        claimed = self._claim_next()
+        if claimed is None:
+            return False
+
+        message_id, key, recipients, subject, body, cv_path, cover_letter_path, attempts = claimed
+        try:
+            self._deliver(key, json.loads(recipients), subject, body, cv_path, cover_letter_path)
+        except PermanentSendError as e:
+            logging.error("Outbox message %d cannot be delivered: %s", message_id, e)
+            self._finish(message_id, FAILED, str(e))
+        except Exception as e:
+            if attempts + 1 >= self.max_attempts:
+                logging.error("Outbox message %d failed after %d attempts: %s", message_id, attempts + 1, e)
+                self._finish(message_id, FAILED, str(e))
+            else:
+                delay = backoff_delay(attempts, base=self.retry_base, cap=self.retry_cap)
+                logging.warning("Outbox message %d failed (attempt %d), retrying in %.0fs: %s",
+                                message_id, attempts + 1, delay, e)
+                self._finish(message_id, QUEUED, str(e), retry_in=delay)
+        else:
+            logging.info("Outbox message %d sent to %s", message_id, recipients)
+            self._finish(message_id, SENT)
+            self._release_attachments(message_id)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if self.process_next():
+                    continue
+            except Exception as e:
+                logging.error("Outbox worker error: %s", e, exc_info=True)
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def start(self):
+        """Starts the background delivery thread if it is not already running."""
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._stop.clear()
+                self._worker = threading.Thread(target=self._run, name="email-outbox", daemon=True)
+                self._worker.start()
+        return self
+
+    def stop(self, timeout=None):
+        """Stops the background thread after the delivery in progress, if any."""
+        self._stop.set()
+        self._wake.set()
+        if self._worker is not None:
+            self._worker.join(timeout)
+
+
+_outboxes = {}
+_outboxes_lock = threading.Lock()
+
+
+def get_outbox(db_name="jobs.db"):
+    """Returns the process-wide outbox for a database with its worker running, creating it on first use."""
+    with _outboxes_lock:
+        if db_name not in _outboxes:
+            _outboxes[db_name] = EmailOutbox(db_name).start()
+        return _outboxes[db_name]
@@ -2,22 +2,289 @@
 import smtplib
 import os
 import time
+import queue
+import atexit
+import base64
+import hashlib
 import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.base import MIMEBase
-from email import encoders
-from dotenv import load_dotenv
+from src.env import load_env
+from src.lazy import lazy_resource
 
-load_dotenv(dotenv_path=r"C:\Users\dell\OneDrive\Desktop\new_AI_job\AI-Agent-Job-Assistant\env\email.env")
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+
+class SMTPPool:
+    """Authenticated SMTP sessions kept open and shared between sends.
+
+    - size: maximum number of sessions open at once; senders beyond it wait for a free one
+    - timeout: socket timeout for each session
+    - check_after: seconds a session may sit idle before it is checked with NOOP on reuse
+
+    A session the server has dropped is replaced transparently: a dead idle
+    session is discarded on reuse, and a send that fails because the server
+    disconnected is retried once over a fresh session.
+    """
+
+    def __init__(self, host, port, user, password, size=2, timeout=30, check_after=30):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.size = size
+        self.timeout = timeout
+        self.check_after = check_after
+        self.connects = 0
+        self.sent = 0
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        logging.info("Connecting to SMTP server %s:%s", self.host, self.port)
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.starttls()
+            server.login(self.user, self.password)
+        except Exception:
+            self._quit(server)
+            raise
+        with self._lock:
+            self.connects += 1
+        logging.info("Logged in as %s", self.user)
+        return server
+
+    @staticmethod
+    def _quit(server):
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+
+    @staticmethod
+    def _is_alive(server):
+        try:
+            return server.noop()[0] == 250
+        except Exception:
+            return False
+
+    def _acquire(self):
+        self._slots.acquire()
+        try:
+            while True:
+                try:
+                    server, last_used = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._connect()
+                if time.monotonic() - last_used < self.check_after or self._is_alive(server):
+                    return server
+                self._quit(server)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, server, broken=False):
+        if broken:
+            self._quit(server)
+        else:
+            self._idle.put((server, time.monotonic()))
+        self._slots.release()
+
+    def sendmail(self, from_addr, recipients, message):
+        """Sends a message over a pooled session and returns the refused recipients, like SMTP.sendmail."""
+        server = self._acquire()
+        try:
+            try:
+                refused = server.sendmail(from_addr, recipients, message)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                logging.info("SMTP session was closed by the server; reconnecting")
+                self._quit(server)
+                server = self._connect()
+                refused = server.sendmail(from_addr, recipients, message)
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+            # The server rejected this message, but the session itself is still usable
+            self._release(server)
+            raise
+        except Exception:
+            self._release(server, broken=True)
+            raise
+        self._release(server)
+        with self._lock:
+            self.sent += 1
+        return refused
+
+    def close(self):
+        """Logs out of every idle session."""
+        while True:
+            try:
+                server, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._quit(server)
+
+
+class AttachmentCache:
+    """Base64-encoded attachment payloads reused across messages, bounded by size with LRU eviction.
+
+    - max_bytes: total size of the encoded payloads kept in memory
+
+    Files are looked up by path, modification time and size, so an unchanged
+    file is never read again; a changed file is re-read, and if its contents
+    hash to a payload already cached, that payload is reused.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._paths = {}  # (path, mtime_ns, size) -> content hash
+        self._payloads = OrderedDict()  # content hash -> (content type, encoded payload)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def guess_content_type(path):
+        content_type, encoding = mimetypes.guess_type(path)
+        # Compressed files (e.g. .gz) report their inner type, but are sent as opaque bytes
+        if content_type is None or encoding is not None:
+            return "application/octet-stream"
+        return content_type
+
+    def _lookup(self, path):
+        stat = os.stat(path)
+        file_key = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            content_hash = self._paths.get(file_key)
+            if content_hash in self._payloads:
+                self._payloads.move_to_end(content_hash)
+                self.hits += 1
+                return self._payloads[content_hash]
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        content_hash = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            self._paths[file_key] = content_hash
+            if content_hash in self._payloads:
+                self._payloads.move_to_end(content_hash)
+                self.hits += 1
+                return self._payloads[content_hash]
+
+        self.misses += 1
+        # encodebytes wraps lines at 76 characters, as the MIME base64 encoder does
+        entry = (self.guess_content_type(path), base64.encodebytes(data).decode("ascii"))
+        with self._lock:
+            if content_hash in self._payloads:
+                # Another sender encoded the same file meanwhile
+                return self._payloads[content_hash]
+            self._payloads[content_hash] = entry
+            self._bytes += len(entry[1])
+            while self._bytes > self.max_bytes and len(self._payloads) > 1:
+                _, (_, evicted) = self._payloads.popitem(last=False)
+                self._bytes -= len(evicted)
+            # Forget paths whose payload was evicted, so the index stays as small as the cache
+            if len(self._paths) > 4 * len(self._payloads):
+                self._paths = {key: value for key, value in self._paths.items() if value in self._payloads}
+        return entry
+
+    def part(self, path):
+        """Returns a new MIME attachment part for a file, built from its cached encoded payload."""
+        content_type, payload = self._lookup(path)
+        maintype, subtype = content_type.split('/', 1)
+        part = MIMEBase(maintype, subtype)
+        part.set_payload(payload)
+        part['Content-Transfer-Encoding'] = 'base64'
+        part.add_header('Content-Disposition', 'attachment', filename=os.path.basename(path))
+        return part
+
+    def stats(self):
+        """Returns the hit/miss counters and the cached size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._payloads), "bytes": self._bytes}
+
+
+attachment_cache = AttachmentCache()
+
+
+def load_smtp_settings():
+    """Returns (user, password, host, port) from the environment, or None if the credentials are missing."""
+    load_env()
+    email_user = os.getenv('EMAIL_USER')
+    email_password = os.getenv('EMAIL_PASSWORD')
+    if not email_user or not email_password:
+        return None
+    return email_user, email_password, os.getenv('EMAIL_HOST', 'smtp.gmail.com'), int(os.getenv('EMAIL_PORT', 587))
+
+
+@lazy_resource
+def get_smtp_pool():
+    """Returns the process-wide SMTP session pool, creating it on first use."""
+    settings = load_smtp_settings()
+    if settings is None:
+        raise ValueError("Email credentials are not set properly in environment variables.")
+    email_user, email_password, email_host, email_port = settings
+    pool = SMTPPool(email_host, email_port, email_user, email_password)
+    atexit.register(pool.close)
+    return pool
+
+
+def _resolve_cover_letter(cv_path, cover_letter_path, job_title, company, applicant_name):
+    """Validates the attachments, generating the cover letter if needed; returns its path or None."""
+    # Validate CV
+    if not os.path.exists(cv_path):
+        logging.error("CV file not found at %s", cv_path)
+        return None
+
+    # Possibly generate cover letter (if not supplied)
+    if cover_letter_path is None:
+        # Only attempt if we have enough info to generate
+        if all([job_title, company, applicant_name]):
+            try:
+                # Import here to avoid circular imports if needed
+                from src.cover_letter_generator import generate_cover_letter
+                cover_letter_path = generate_cover_letter(job_title, company, applicant_name, cv_path)
+            except Exception as e:
+                logging.error("Error generating cover letter: %s", e, exc_info=True)
+                return None
+        else:
+            logging.error("No cover letter provided and not enough data to generate one.")
+            return None
+
+    # Validate cover letter
+    if not os.path.exists(cover_letter_path):
+        logging.error("Cover letter file not found at %s", cover_letter_path)
+        return None
+    return cover_letter_path
+
+
+def build_application_message(email_user, recipients, subject, body, cv_path, cover_letter_path):
+    """Builds the MIME message for an application with the CV and cover letter attached."""
+    msg = MIMEMultipart()
+    msg['From'] = email_user
+    msg['To'] = ", ".join(recipients)
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'plain'))
+
+    # Attachments are read and encoded once, then reused for every message that carries them
+    logging.info("Attaching CV from %s", cv_path)
+    msg.attach(attachment_cache.part(cv_path))
+    logging.info("Attaching cover letter from %s", cover_letter_path)
+    msg.attach(attachment_cache.part(cover_letter_path))
+    return msg
+
+
 def send_job_application_email(to_email, subject, body, cv_path, cover_letter_path=None,
                                job_title=None, company=None, applicant_name=None,
                                max_retries=3):
     """
-    Sends an email with CV and cover letter attached.
+    Sends an email with CV and cover letter attached, over a pooled SMTP session.
     - to_email: string or list of strings
     - subject: string
     - body: string
@@ -27,82 +294,28 @@ def send_job_application_email(to_email, subject, body, cv_path, cover_letter_pa
     Returns True on success, False otherwise.
     """
     try:
-        # Validate CV
-        if not os.path.exists(cv_path):
-            logging.error("CV file not found at %s", cv_path)
-            return False
-
-        # Possibly generate cover letter (if not supplied)
+        cover_letter_path = _resolve_cover_letter(cv_path, cover_letter_path, job_title, company, applicant_name)
         if cover_letter_path is None:
-            # Only attempt if we have enough info to generate
-            if all([job_title, company, applicant_name]):
-                try:
-                    # Import here to avoid circular imports if needed
-                    from src.cover_letter_generator import generate_cover_letter
-                    cover_letter_path = generate_cover_letter(job_title, company, applicant_name, cv_path)
-                except Exception as e:
-                    logging.error("Error generating cover letter: %s", e, exc_info=True)
-                    return False
-            else:
-                logging.error("No cover letter provided and not enough data to generate one.")
-                return False
-
-        # Validate cover letter
-        if not os.path.exists(cover_letter_path):
-            logging.error("Cover letter file not found at %s", cover_letter_path)
             return False
 
         # Load SMTP credentials
-        email_user = os.getenv('EMAIL_USER')
-        email_password = os.getenv('EMAIL_PASSWORD')
-        email_host = os.getenv('EMAIL_HOST', 'smtp.gmail.com')
-        email_port = int(os.getenv('EMAIL_PORT', 587))
-
-        if not email_user or not email_password:
+        settings = load_smtp_settings()
+        if settings is None:
             logging.error("Email credentials are not set properly in environment variables.")
             return False
+        email_user = settings[0]
 
-        # Build message
-        msg = MIMEMultipart()
-        msg['From'] = email_user
         # Normalize recipients to list
         recipients = to_email if isinstance(to_email, (list, tuple)) else [to_email]
-        msg['To'] = ", ".join(recipients)
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain'))
-
-        # Attach CV (use application/pdf when possible)
-        logging.info("Attaching CV from %s", cv_path)
-        with open(cv_path, 'rb') as f:
-            part = MIMEBase('application', 'pdf')
-            part.set_payload(f.read())
-        encoders.encode_base64(part)
-        part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(cv_path)}"')
-        msg.attach(part)
-
-        # Attach cover letter
-        logging.info("Attaching cover letter from %s", cover_letter_path)
-        with open(cover_letter_path, 'rb') as f:
-            part = MIMEBase('application', 'pdf')
-            part.set_payload(f.read())
-        encoders.encode_base64(part)
-        part.add_header('Content-Disposition', f'attachment; filename="{os.path.basename(cover_letter_path)}"')
-        msg.attach(part)
+        msg = build_application_message(email_user, recipients, subject, body, cv_path, cover_letter_path)
 
         # Send with retries
         for attempt in range(1, max_retries + 1):
             try:
-                logging.info("Connecting to SMTP server %s:%s (attempt %d)", email_host, email_port, attempt)
-                with smtplib.SMTP(email_host, email_port, timeout=30) as server:
-                    server.set_debuglevel(1)
-                    server.starttls()
-                    logging.info("Started TLS")
-                    server.login(email_user, email_password)
-                    logging.info("Logged in as %s", email_user)
-                    # sendmail expects a list of recipients
-                    server.sendmail(email_user, recipients, msg.as_string())
-                    logging.info("Email sent successfully to %s", recipients)
-                    return True
+                # sendmail expects a list of recipients
+                get_smtp_pool().sendmail(email_user, recipients, msg.as_string())
+                logging.info("Email sent successfully to %s", recipients)
+                return True
             except Exception as e:
                 logging.error("Failed to send email (attempt %d): %s", attempt, str(e), exc_info=True)
                 if attempt < max_retries:
@@ -114,3 +327,55 @@ def send_job_application_email(to_email, subject, body, cv_path, cover_letter_pa
     except Exception as e:
         logging.error("Unexpected error in send_job_application_email: %s", e, exc_info=True)
         return False
+
+
+def send_many(applications, max_sessions=None):
+    """
+    Sends a batch of applications over the shared pool of SMTP sessions.
+    - applications: dicts of send_job_application_email arguments (to_email, subject, body, cv_path, ...)
+    - max_sessions: number of sessions sending in parallel; defaults to the pool size
+    Returns a dict with one result per application (to, subject, ok, error), the sent and
+    failed counts, the elapsed seconds and messages_per_sec.
+    """
+    settings = load_smtp_settings()
+    pool = get_smtp_pool() if settings is not None else None
+
+    def send(application):
+        recipients = application['to_email']
+        recipients = recipients if isinstance(recipients, (list, tuple)) else [recipients]
+        result = {"to": recipients, "subject": application['subject'], "ok": False, "error": None}
+        try:
+            if pool is None:
+                raise ValueError("Email credentials are not set properly in environment variables.")
+            cover_letter_path = _resolve_cover_letter(
+                application['cv_path'], application.get('cover_letter_path'), application.get('job_title'),
+                application.get('company'), application.get('applicant_name')
+            )
+            if cover_letter_path is None:
+                raise ValueError("Attachments are missing")
+            msg = build_application_message(settings[0], recipients, application['subject'], application['body'],
+                                            application['cv_path'], cover_letter_path)
+            refused = pool.sendmail(settings[0], recipients, msg.as_string())
+            result["ok"] = True
+            if refused:
+                result["error"] = f"Refused recipients: {', '.join(refused)}"
+        except Exception as e:
+            logging.error("Failed to send application to %s: %s", recipients, e)
+            result["error"] = str(e)
+        return result
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_sessions or (pool.size if pool else 1)) as executor:
+        results = list(executor.map(send, applications))
+    elapsed = time.perf_counter() - start
+
+    sent = sum(result["ok"] for result in results)
+    rate = sent / elapsed if elapsed > 0 else 0.0
+    logging.info("Sent %d of %d applications in %.1fs (%.1f messages/sec)", sent, len(results), elapsed, rate)
+    return {
+        "results": results,
+        "sent": sent,
+        "failed": len(results) - sent,
+        "elapsed": elapsed,
+        "messages_per_sec": rate,
+    }
@@ -0,0 +1,21 @@
+from dotenv import load_dotenv
+from src.lazy import lazy_resource
+
+# Loaded in this order; a variable set by an earlier file (or already in the environment) is kept
+ENV_FILES = (
+    r"C:\Users\nagar\Desktop\my_project\job_automate\JobPilot\.env",
+    r"C:\Users\nagar\Desktop\my_project\job_automate\JobPilot\gmail.env",
+    r"C:\Users\dell\OneDrive\Desktop\new_AI_job\AI-Agent-Job-Assistant\env\email.env",
+)
+
+
+@lazy_resource
+def load_env():
+    """Loads the .env files once, the first time any credential is needed.
+
+    Reads the machine-specific files above, then the project's own .env found
+    by searching up from this package, which is where the README says keys go.
+    """
+    for path in ENV_FILES:
+        load_dotenv(dotenv_path=path)
+    return load_dotenv()
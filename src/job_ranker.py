@@ -0,0 +1,231 @@
+import re
+import zlib
+import threading
+import numpy as np
+from scipy import sparse
+
+N_FEATURES = 2 ** 18
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#]*")
+STOP_WORDS = frozenset("""
+a about above after all also an and any are as at be been being but by can could did do does for from
+had has have having he her here his how i if in into is it its job me more most my no not of on one
+or our out over role she so some such than that the their them then there these they this to under up
+us was we were what when where which while who will with within work would you your
+""".split())
+
+
+def tokenize(text):
+    """Lowercases text and returns its terms, without stop words and single characters."""
+    return [term for term in TOKEN_PATTERN.findall((text or "").lower())
+            if len(term) > 1 and term not in STOP_WORDS]
+
+
+def term_index(term, n_features=N_FEATURES):
+    """Maps a term to its hashed column; crc32 keeps columns stable across processes."""
+    return zlib.crc32(term.encode("utf-8")) % n_features
+
+
+class JobRanker:
+    """Hashed TF-IDF matrix over job descriptions, scored against a CV in one sparse product.
+
+    Rows hold sublinear term frequencies (1 + log tf) in ``n_features`` hashed
+    columns, so new jobs are appended without refitting a vocabulary. IDF
+    weights come from document frequencies maintained as rows are added and
+    are applied at query time, so adding jobs never rescales stored rows.
+    """
+
+    def __init__(self, n_features=N_FEATURES):
+        self.n_features = n_features
+        self.job_ids = np.zeros(0, dtype=np.int64)
+        self.term_freqs = sparse.csr_matrix((0, n_features), dtype=np.float32)
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.last_job_id = 0
+        self.last_change_seq = 0  # Position in the job_text_changes log already applied
+        self._squared = None
+        self._columns = {}  # term -> hashed column, so each distinct term is hashed once
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.job_ids)
+
+    def _column(self, term):
+        column = self._columns.get(term)
+        if column is None:
+            column = self._columns[term] = term_index(term, self.n_features)
+        return column
+
+    def _vectorize(self, texts):
+        """Builds the sublinear term-frequency matrix for a list of texts."""
+        columns, indptr = [], [0]
+        for text in texts:
+            columns.extend(self._column(term) for term in tokenize(text))
+            indptr.append(len(columns))
+        matrix = sparse.csr_matrix(
+            (np.ones(len(columns), dtype=np.float32), np.asarray(columns, dtype=np.int64), indptr),
+            shape=(len(indptr) - 1, self.n_features)
+        )
+        # Summing the duplicate columns of a row yields its term counts
+        matrix.sum_duplicates()
+        matrix.data = 1 + np.log(matrix.data)
+        return matrix
+
+    def add_jobs(self, job_ids, texts):
+        """Appends jobs to the matrix and updates the document frequencies."""
+        matrix = self._vectorize(list(texts))
+        with self._lock:
+            self.job_ids = np.concatenate([self.job_ids, np.asarray(job_ids, dtype=np.int64)])
+            self.term_freqs = sparse.vstack([self.term_freqs, matrix], format="csr")
+            self.doc_freq += np.bincount(matrix.indices, minlength=self.n_features)
+            if len(self.job_ids):
+                self.last_job_id = max(self.last_job_id, int(self.job_ids.max()))
+            self._squared = None
+
+    def remove_jobs(self, job_ids):
+        """Drops the rows of the given jobs from the matrix and their document frequencies."""
+        with self._lock:
+            removed = np.isin(self.job_ids, np.asarray(list(job_ids), dtype=np.int64))
+            if not removed.any():
+                return
+            self.doc_freq -= np.bincount(self.term_freqs[removed].indices, minlength=self.n_features)
+            self.term_freqs = self.term_freqs[~removed]
+            self.job_ids = self.job_ids[~removed]
+            self._squared = None
+
+    def _apply_changes(self, conn, upto):
+        """Re-vectorizes indexed jobs whose title or description changed, and drops deleted ones."""
+        changed = [job_id for (job_id,) in conn.execute(
+            "SELECT DISTINCT job_id FROM job_text_changes WHERE seq > ? AND seq <= ? AND job_id <= ?",
+            (self.last_change_seq, upto, self.last_job_id)
+        )]
+        self.last_change_seq = upto
+        if not changed:
+            return 0
+        self.remove_jobs(changed)
+        rows = conn.execute(
+            f"SELECT id, title, description FROM jobs WHERE id IN ({', '.join('?' for _ in changed)})", changed
+        ).fetchall()
+        if rows:
+            self.add_jobs([row[0] for row in rows], [f"{row[1] or ''}\n{row[2] or ''}" for row in rows])
+        return len(changed)
+
+    def sync(self, conn, batch_size=5000):
+        """Brings the matrix up to date with the database and returns how many jobs were (re)indexed.
+
+        New rows are read by id; listings edited or deleted since the last sync
+        are found through the job_text_changes log, so unchanged rows are never re-read.
+        If the log was trimmed past this index's position, the index is rebuilt.
+        """
+        with self._lock:
+            upto, oldest = conn.execute(
+                "SELECT COALESCE(MAX(seq), 0), MIN(seq) FROM job_text_changes"
+            ).fetchone()
+            if self.last_job_id and oldest is not None and self.last_change_seq < oldest - 1:
+                # Another index trimmed changes this one never applied
+                return self.rebuild(conn)
+            if self.last_job_id == 0:
+                # Everything is about to be read fresh, so earlier changes are already included
+                self.last_change_seq = upto
+            added = self._apply_changes(conn, upto)
+            while True:
+                rows = conn.execute(
+                    "SELECT id, title, description FROM jobs WHERE id > ? ORDER BY id LIMIT ?",
+                    (self.last_job_id, batch_size)
+                ).fetchall()
+                if not rows:
+                    return added
+                self.add_jobs([row[0] for row in rows], [f"{row[1] or ''}\n{row[2] or ''}" for row in rows])
+                added += len(rows)
+
+    def trim_changes(self, conn):
+        """Deletes the job_text_changes rows this index has applied, keeping the latest one.
+
+        The kept row marks where the log was trimmed, which lets an index that
+        is further behind notice the gap and rebuild. Run it in a write transaction.
+        """
+        with self._lock:
+            return conn.execute("DELETE FROM job_text_changes WHERE seq < ?", (self.last_change_seq,)).rowcount
+
+    def rebuild(self, conn):
+        """Discards the matrix and indexes every stored job again."""
+        with self._lock:
+            self.job_ids = np.zeros(0, dtype=np.int64)
+            self.term_freqs = sparse.csr_matrix((0, self.n_features), dtype=np.float32)
+            self.doc_freq = np.zeros(self.n_features, dtype=np.int64)
+            self.last_job_id = 0
+            self.last_change_seq = 0
+            self._squared = None
+            return self.sync(conn)
+
+    def idf(self):
+        """Smoothed inverse document frequencies for every hashed column."""
+        return (np.log((1 + len(self.job_ids)) / (1 + self.doc_freq)) + 1).astype(np.float32)
+
+    def _snapshot(self):
+        """Returns a consistent view of the matrix, its element-wise square and the job ids."""
+        with self._lock:
+            if self._squared is None:
+                squared = self.term_freqs.copy()
+                squared.data **= 2
+                self._squared = squared
+            return self.term_freqs, self._squared, self.job_ids, self.idf()
+
+    def rank(self, text, top_k=10):
+        """Scores every job against ``text`` by cosine similarity and returns the top_k matches.
+
+        Each result is a dict with job_id, score and matched_terms, the query
+        terms that contributed most to the score.
+        """
+        term_freqs, squared, job_ids, idf = self._snapshot()
+        if term_freqs.shape[0] == 0:
+            return []
+
+        terms = {}
+        for term in tokenize(text):
+            terms.setdefault(self._column(term), term)
+        query = self._vectorize([text])
+        query_weights = np.zeros(self.n_features, dtype=np.float32)
+        query_weights[query.indices] = query.data * idf[query.indices]
+        query_norm = np.linalg.norm(query_weights)
+        if query_norm == 0:
+            return []
+
+        # cosine(row, query) with IDF applied to both sides: two sparse mat-vec products over the archive
+        idf_query = idf * query_weights / query_norm
+        row_norms = np.sqrt(squared @ (idf * idf))
+        row_norms[row_norms == 0] = 1
+        scores = (term_freqs @ idf_query) / row_norms
+
+        top_k = min(top_k, len(scores))
+        top = np.argpartition(-scores, top_k - 1)[:top_k]
+        top = top[np.argsort(-scores[top])]
+
+        results = []
+        for row in top:
+            if scores[row] <= 0:
+                break
+            start, end = term_freqs.indptr[row], term_freqs.indptr[row + 1]
+            columns = term_freqs.indices[start:end]
+            contributions = term_freqs.data[start:end] * idf_query[columns]
+            matched = [
+                terms[column]
+                for column, contribution in sorted(zip(columns, contributions), key=lambda item: -item[1])
+                if contribution > 0 and column in terms
+            ]
+            results.append({
+                "job_id": int(job_ids[row]),
+                "score": float(scores[row]),
+                "matched_terms": matched[:10],
+            })
+        return results
+
+
+_rankers = {}
+_rankers_lock = threading.Lock()
+
+
+def get_job_ranker(db_name):
+    """Returns the process-wide ranker for a jobs database, creating it on first use."""
+    with _rankers_lock:
+        if db_name not in _rankers:
+            _rankers[db_name] = JobRanker()
+        return _rankers[db_name]
@@ -1,19 +1,339 @@
 import pandas as pd
 import sqlite3
 import time
+import queue
+import threading
+import copy
+import functools
 import requests
-from datetime import datetime
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
 import os
-from dotenv import load_dotenv
+import re
+import hashlib
+from src.bulk_writer import BulkWriter, configure_connection
+from src.env import load_env
+from src.nlp_processing import extract_skills_batch, extract_skills_from_description, get_skill_taxonomy
+from src.near_duplicates import update_duplicate_clusters
+from src.aggregates import create_job_aggregates, rebuild_job_aggregates, rebuild_application_aggregates
+from src.rate_limiter import backoff_delay, get_circuit_breaker, get_rate_limiter, parse_retry_after
+
+
+JOB_COLUMNS = [
+    "job_key", "job_title", "title", "company", "location", "created", "description",
+    "salary_min", "salary_max", "contract_type", "contract_time", "apply_link"
+]
+
+UPSERT_JOB_QUERY = f'''
+INSERT INTO jobs ({", ".join(JOB_COLUMNS)})
+VALUES ({", ".join("?" for _ in JOB_COLUMNS)})
+ON CONFLICT(job_key) DO UPDATE SET
+    {", ".join(f"{column} = excluded.{column}" for column in JOB_COLUMNS[1:])},
+    skills_version = CASE
+        WHEN jobs.title IS excluded.title AND jobs.description IS excluded.description
+        THEN jobs.skills_version
+    END,
+    cluster_id = CASE
+        WHEN jobs.title IS excluded.title AND jobs.description IS excluded.description
+        THEN jobs.cluster_id
+    END
+'''
+
+
+def make_job_key(adzuna_id=None, apply_link=None, fallback=()):
+    """Returns a stable identity for a listing.
+
+    Prefers the Adzuna id, which is also embedded in the path of Adzuna redirect
+    links, and otherwise hashes the link without its per-search tracking query.
+    Listings without a usable link are hashed from the ``fallback`` fields.
+    """
+    if adzuna_id:
+        return f"adzuna:{adzuna_id}"
+
+    link = (apply_link or "").split("#", 1)[0].split("?", 1)[0]
+    match = re.search(r"/ad/(\d+)", link)
+    if match:
+        return f"adzuna:{match.group(1)}"
+
+    if not link or link == "Unknown":
+        link = "|".join(str(value) for value in fallback)
+    return "sha1:" + hashlib.sha1(link.encode("utf-8")).hexdigest()
+
+
+def _add_job_key(conn):
+    """Migration 1: backfills job_key, collapses duplicate listings and makes job_key unique."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "job_key" not in columns:
+        conn.execute("ALTER TABLE jobs ADD COLUMN job_key TEXT")
+
+    rows = conn.execute(
+        "SELECT id, apply_link, title, company, location, created FROM jobs WHERE job_key IS NULL"
+    ).fetchall()
+    conn.executemany(
+        "UPDATE jobs SET job_key = ? WHERE id = ?",
+        [(make_job_key(apply_link=row[1], fallback=row[2:]), row[0]) for row in rows]
+    )
+
+    # Keep the most recently saved copy of every listing
+    removed = conn.execute(
+        "DELETE FROM jobs WHERE id NOT IN (SELECT MAX(id) FROM jobs GROUP BY job_key)"
+    ).rowcount
+    if removed:
+        print(f"🧹 Removed {removed} duplicate jobs.")
+
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_job_key ON jobs(job_key)")
+
+
+def _add_query_indexes(conn):
+    """Migration 2: secondary indexes backing the filters and sort orders of query_jobs."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs(created, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_company ON jobs(company COLLATE NOCASE, created, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_salary_min ON jobs(salary_min, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_salary_max ON jobs(salary_max, id)")
+
+
+def _add_full_text_index(conn):
+    """Migration 3: FTS5 index over title, company and description, kept in sync by triggers."""
+    conn.execute('''
+    CREATE VIRTUAL TABLE IF NOT EXISTS jobs_fts USING fts5(
+        title, company, description,
+        content='jobs', content_rowid='id', tokenize='porter unicode61'
+    )
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_insert AFTER INSERT ON jobs BEGIN
+        INSERT INTO jobs_fts(rowid, title, company, description)
+        VALUES (new.id, new.title, new.company, new.description);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_delete AFTER DELETE ON jobs BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company, description)
+        VALUES ('delete', old.id, old.title, old.company, old.description);
+    END
+    ''')
+    _create_fts_update_trigger(conn)
+    # Index the rows that were stored before the triggers existed
+    conn.execute("INSERT INTO jobs_fts(jobs_fts) VALUES ('rebuild')")
+
+
+def _create_fts_update_trigger(conn):
+    # The upsert rewrites every column, so an unchanged listing must not re-index its row
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS jobs_fts_update AFTER UPDATE OF title, company, description ON jobs
+    WHEN old.title IS NOT new.title OR old.company IS NOT new.company OR old.description IS NOT new.description
+    BEGIN
+        INSERT INTO jobs_fts(jobs_fts, rowid, title, company, description)
+        VALUES ('delete', old.id, old.title, old.company, old.description);
+        INSERT INTO jobs_fts(rowid, title, company, description)
+        VALUES (new.id, new.title, new.company, new.description);
+    END
+    ''')
+
+
+def _add_job_skills(conn):
+    """Migration 4: job_skills table filled at ingest, with skills_version marking processed jobs."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "skills_version" not in columns:
+        # NULL until skills are extracted; reset to NULL when the title or description changes
+        conn.execute("ALTER TABLE jobs ADD COLUMN skills_version TEXT")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_skills_version ON jobs(skills_version)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS job_skills (
+        job_id INTEGER NOT NULL,
+        skill TEXT NOT NULL COLLATE NOCASE,
+        PRIMARY KEY (job_id, skill)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_skills_skill ON job_skills(skill, job_id)")
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS job_skills_delete AFTER DELETE ON jobs BEGIN
+        DELETE FROM job_skills WHERE job_id = old.id;
+    END
+    ''')
+
+
+def _add_duplicate_clusters(conn):
+    """Migration 5: MinHash signatures, LSH buckets and a cluster_id grouping near-duplicate postings."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+    if "cluster_id" not in columns:
+        # Id of the cluster's representative job; NULL until the job has been signed
+        conn.execute("ALTER TABLE jobs ADD COLUMN cluster_id INTEGER")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_cluster_id ON jobs(cluster_id)")
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS job_minhash (
+        job_id INTEGER PRIMARY KEY,
+        signature BLOB NOT NULL
+    )
+    ''')
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS job_lsh_buckets (
+        band INTEGER NOT NULL,
+        bucket INTEGER NOT NULL,
+        job_id INTEGER NOT NULL,
+        PRIMARY KEY (band, bucket, job_id)
+    ) WITHOUT ROWID
+    ''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_job_lsh_buckets_job_id ON job_lsh_buckets(job_id)")
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS job_minhash_delete AFTER DELETE ON jobs BEGIN
+        DELETE FROM job_minhash WHERE job_id = old.id;
+        DELETE FROM job_lsh_buckets WHERE job_id = old.id;
+    END
+    ''')
+
+
+def _add_metadata(conn):
+    """Adds a key/value table for database-wide state such as the time of the last ingest."""
+    conn.execute("CREATE TABLE IF NOT EXISTS metadata (name TEXT PRIMARY KEY, value)")
+
+
+def _add_aggregates(conn):
+    """Adds the dashboard aggregate tables, kept current by triggers, and fills them from the jobs stored so far."""
+    create_job_aggregates(conn)
+    rebuild_job_aggregates(conn)
+    rebuild_application_aggregates(conn)
+
+
+def _add_job_text_changes(conn):
+    """Logs jobs whose title or description changed, or that were deleted, for the in-memory ranker."""
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS job_text_changes (seq INTEGER PRIMARY KEY AUTOINCREMENT, job_id INTEGER NOT NULL)"
+    )
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS jobs_text_change AFTER UPDATE OF title, description ON jobs
+    WHEN old.title IS NOT new.title OR old.description IS NOT new.description
+    BEGIN
+        INSERT INTO job_text_changes (job_id) VALUES (new.id);
+    END
+    ''')
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS jobs_text_delete AFTER DELETE ON jobs
+    BEGIN
+        INSERT INTO job_text_changes (job_id) VALUES (old.id);
+    END
+    ''')
+
+
+def _add_cluster_orphan_reset(conn):
+    """Sends the members of a deleted cluster representative back to be clustered again."""
+    conn.execute('''
+    CREATE TRIGGER IF NOT EXISTS jobs_cluster_orphans AFTER DELETE ON jobs
+    BEGIN
+        UPDATE jobs SET cluster_id = NULL WHERE cluster_id = old.id;
+    END
+    ''')
+    conn.execute(
+        "UPDATE jobs SET cluster_id = NULL WHERE cluster_id IS NOT NULL AND cluster_id NOT IN (SELECT id FROM jobs)"
+    )
+
+
+def _skip_unchanged_fts_updates(conn):
+    """Replaces the full-text update trigger with one that fires only when the indexed text changed."""
+    conn.execute("DROP TRIGGER IF EXISTS jobs_fts_update")
+    _create_fts_update_trigger(conn)
+
+
+# Applied in order; PRAGMA user_version records how many have run on a database
+MIGRATIONS = [
+    _add_job_key,
+    _add_query_indexes,
+    _add_full_text_index,
+    _add_job_skills,
+    _add_duplicate_clusters,
+    _add_metadata,
+    _add_aggregates,
+    _add_job_text_changes,
+    _add_cluster_orphan_reset,
+    _skip_unchanged_fts_updates,
+]
+
+# Columns returned by query_jobs unless others are requested; descriptions are left out
+SUMMARY_COLUMNS = [
+    "id", "job_title", "title", "company", "location", "created",
+    "salary_min", "salary_max", "contract_type", "contract_time", "apply_link"
+]
+SORT_COLUMNS = ("created", "salary_min", "salary_max")
+# Longest Retry-After, in seconds, worth waiting for inside a request; longer ones skip the request
+MAX_RETRY_AFTER = 60.0
+
+
+def _fts_query(text):
+    """Turns free text into an FTS5 query matching every word, ignoring FTS5 operators in the input."""
+    return " ".join(f'"{word}"' for word in re.findall(r"\w+", text))
+
+
+def _escape_like(value):
+    """Escapes LIKE wildcards so user input is matched literally."""
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def create_jobs_schema(conn):
+    """Creates the jobs table if it doesn't exist and migrates it to the current schema."""
+    query = '''
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_title TEXT,
+        title TEXT,
+        company TEXT,
+        location TEXT,
+        created TEXT,
+        description TEXT,
+        salary_min REAL,
+        salary_max REAL,
+        contract_type TEXT,
+        contract_time TEXT,
+        apply_link TEXT
+    )
+    '''
+    conn.execute(query)
+    conn.commit()
+    migrate_jobs_db(conn)
+
+
+def migrate_jobs_db(conn):
+    """Applies the schema migrations this database has not seen yet."""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, migration in enumerate(MIGRATIONS, start=1):
+        if version >= target:
+            continue
+        with conn:
+            migration(conn)
+            conn.execute(f"PRAGMA user_version = {target}")
+
+
+def open_jobs_db(db_name="jobs.db", check_same_thread=True):
+    """Opens the jobs database for reading and writing stored jobs; unlike JobScraper it needs no API credentials."""
+    conn = configure_connection(sqlite3.connect(db_name, check_same_thread=check_same_thread))
+    create_jobs_schema(conn)
+    return conn
+
+
+def _serialized(method):
+    """Runs a JobScraper method while holding the lock of its shared write connection."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._db_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _reading(method):
+    """Runs a JobScraper method while holding the lock of its shared read connection."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._read_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
 
-# Load the .env file
-load_dotenv(dotenv_path=r"C:\Users\nagar\Desktop\my_project\job_automate\JobPilot\.env")
 
-# Debugging: Check if the environment variables are loaded correctly
-print(f"APP_ID: {os.getenv('APP_ID')}")
-print(f"API_KEY: {os.getenv('API_KEY')}")
 class JobScraper:
-    def __init__(self, job_titles, location="New York", db_name="jobs.db"):
+    def __init__(self, job_titles, location="New York", db_name="jobs.db", max_workers=8, timeout=10,
+                 results_per_page=10, max_pages=1, cache=None, requests_per_second=5, extract_skills=True,
+                 detect_duplicates=True):
+        load_env()
+
         # Fetch sensitive data securely from environment variables
         self.app_id = os.getenv('APP_ID')  # Fetch app_id from the .env file
         self.api_key = os.getenv('API_KEY')  # Fetch api_key from the .env file
@@ -24,114 +344,523 @@ class JobScraper:
         
         self.job_titles = job_titles
         self.location = location
-        self.url = "https://api.adzuna.com/v1/api/jobs/gb/search/1"
+        self.base_url = "https://api.adzuna.com/v1/api/jobs/gb/search"
+        self.results_per_page = results_per_page
+        self.max_pages = max_pages  # Pages walked per title; the crawl stops early once results run out
+        self.max_workers = max_workers  # Concurrency cap for concurrent crawls
+        self.timeout = timeout  # Per-request timeout in seconds
+        self.session = self._create_session()
+        self.cache = cache  # Optional ResponseCache shared across scrapers
+        # Shared by every scraper in the process so parallel crawls stay within Adzuna's limits
+        self.rate_limiter = get_rate_limiter("adzuna", requests_per_second)
+        self.circuit_breaker = get_circuit_breaker("adzuna")
+        self.extract_skills = extract_skills  # Fill job_skills as part of save_to_db
+        self.detect_duplicates = detect_duplicates  # Cluster near-duplicate postings as part of save_to_db
         self.db_name = db_name
-        self.conn = sqlite3.connect(self.db_name)
+        # Connections shared by every thread using this scraper, such as all Streamlit sessions.
+        # Writes go through self.conn under self._db_lock; queries use self.read_conn under
+        # self._read_lock, so WAL lets them run while a crawl is writing.
+        self.conn = configure_connection(sqlite3.connect(self.db_name, check_same_thread=False))
+        self._db_lock = threading.RLock()
         self.create_table()
+        self.read_conn = configure_connection(sqlite3.connect(self.db_name, check_same_thread=False))
+        self._read_lock = threading.Lock()
+        # Only used inside JobRanker.sync, which serializes its callers
+        self.ranker_conn = configure_connection(sqlite3.connect(self.db_name, check_same_thread=False))
+        self.writer = BulkWriter(self.conn, UPSERT_JOB_QUERY, JOB_COLUMNS)
+
+    def with_search(self, job_titles, location=None, results_per_page=None, max_pages=None):
+        """Returns a scraper for another search that shares this one's HTTP session, cache and connections."""
+        scraper = copy.copy(self)
+        scraper.job_titles = job_titles
+        if location is not None:
+            scraper.location = location
+        if results_per_page is not None:
+            scraper.results_per_page = results_per_page
+        if max_pages is not None:
+            scraper.max_pages = max_pages
+        return scraper
+
+    def _create_session(self):
+        """Creates a keep-alive HTTP session with enough pooled connections for every worker."""
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        session.mount("https://", adapter)
+        return session
     
+    @_serialized
     def create_table(self):
-        """Creates the jobs table in SQLite if it doesn't exist."""
-        query = '''
-        CREATE TABLE IF NOT EXISTS jobs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            job_title TEXT,
-            title TEXT,
-            company TEXT,
-            location TEXT,
-            created TEXT,
-            description TEXT,
-            salary_min REAL,
-            salary_max REAL,
-            contract_type TEXT,
-            contract_time TEXT,
-            apply_link TEXT
-        )
-        '''
-        self.conn.execute(query)
-        self.conn.commit()
+        """Creates the jobs table in SQLite if it doesn't exist and migrates it to the current schema."""
+        create_jobs_schema(self.conn)
+
+    def migrate(self):
+        """Applies the schema migrations this database has not seen yet."""
+        migrate_jobs_db(self.conn)
     
-    def scrape_jobs(self):
-        """Fetches job listings from Adzuna API and stores them in the database."""
-        all_jobs = []
-        
-        for job_title in self.job_titles:
-            params = {
-                "app_id": self.app_id,
-                "app_key": self.api_key,
-                "what": job_title,
-                "where": self.location,
-                "results_per_page": 10
-            }
-            
-            retries = 3
-            for attempt in range(retries):
-                try:
-                    response = requests.get(self.url, params=params)
-                    
-                    if response.status_code == 200:
-                        data = response.json()
-                        jobs = data.get("results", [])
-                        
-                        if jobs:
-                            for job in jobs:
-                                # Ensure job title and company are not missing
-                                job_title = job.get("title", "Unknown")
-                                company = job.get("company", {}).get("display_name", "Unknown")
-                                
-                                if job_title == "Unknown" or company == "Unknown":
-                                    print(f"⚠️ Missing details for a job: {job}")
-                                
-                                all_jobs.append({
-                                    "job_title": job_title,
-                                    "title": job_title,
-                                    "company": company,
-                                    "location": job.get("location", {}).get("display_name", "Unknown"),
-                                    "created": job.get("created", "Unknown"),
-                                    "description": job.get("description", "Unknown"),
-                                    "salary_min": job.get("salary_min", None),
-                                    "salary_max": job.get("salary_max", None),
-                                    "contract_type": job.get("contract_type", "Unknown"),
-                                    "contract_time": job.get("contract_time", "Unknown"),
-                                    "apply_link": job.get("redirect_url", "Unknown")
-                                })
-                            print(f"✅ Data for '{job_title}' added.")
-                        else:
-                            print(f"❌ No job data returned for '{job_title}'.")
-                        break  # Exit retry loop if successful
+    def _normalize_job(self, job):
+        """Maps a raw Adzuna result onto the columns of the jobs table."""
+        # Ensure job title and company are not missing
+        job_title = job.get("title", "Unknown")
+        company = job.get("company", {}).get("display_name", "Unknown")
+
+        if job_title == "Unknown" or company == "Unknown":
+            print(f"⚠️ Missing details for a job: {job}")
+
+        return {
+            "job_key": make_job_key(
+                job.get("id"),
+                job.get("redirect_url"),
+                (job_title, company, job.get("created"))
+            ),
+            "job_title": job_title,
+            "title": job_title,
+            "company": company,
+            "location": job.get("location", {}).get("display_name", "Unknown"),
+            "created": job.get("created", "Unknown"),
+            "description": job.get("description", "Unknown"),
+            "salary_min": job.get("salary_min", None),
+            "salary_max": job.get("salary_max", None),
+            "contract_type": job.get("contract_type", "Unknown"),
+            "contract_time": job.get("contract_time", "Unknown"),
+            "apply_link": job.get("redirect_url", "Unknown")
+        }
+
+    def _request_page(self, url, params, job_title):
+        """Requests one results page from Adzuna, retrying with jittered exponential backoff.
+
+        Every request takes a token from the process-wide Adzuna rate limiter, and
+        429/503 responses pause that limiter for their Retry-After. Rate limiting,
+        server errors and network failures count towards the shared circuit
+        breaker, which skips requests while the endpoint keeps failing. A
+        Retry-After longer than MAX_RETRY_AFTER opens the breaker for that long
+        and gives up, rather than stalling every Adzuna request in the process.
+        Returns the decoded JSON response, or None if every attempt failed.
+        """
+        retries = 3
+        for attempt in range(retries):
+            if not self.circuit_breaker.allow_request():
+                print(f"🚫 Adzuna is failing repeatedly; skipping '{job_title}' for now.")
+                return None
+
+            self.rate_limiter.acquire()
+            retry_after = None
+            try:
+                response = self.session.get(url, params=params, timeout=self.timeout)
+
+                if response.status_code == 200:
+                    self.circuit_breaker.record_success()
+                    return response.json()
+
+                print(f"⚠️ Error fetching data for '{job_title}': {response.status_code}")
+                print(f"Response: {response.text}")  # Debugging line
+                if response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    if retry_after and retry_after > MAX_RETRY_AFTER:
+                        print(f"🚫 Adzuna asked to wait {retry_after:.0f}s; skipping '{job_title}' for now.")
+                        self.circuit_breaker.trip(retry_after)
+                        return None
+                    if retry_after:
+                        self.rate_limiter.pause(retry_after)
+                if response.status_code == 429 or response.status_code >= 500:
+                    self.circuit_breaker.record_failure()
+                else:
+                    # The endpoint answered; the request itself was rejected
+                    self.circuit_breaker.record_success()
+
+            except requests.exceptions.RequestException as e:
+                print(f"🚨 Request failed for '{job_title}': {e}")
+                self.circuit_breaker.record_failure()
+
+            if attempt < retries - 1:
+                time.sleep(backoff_delay(attempt, cap=MAX_RETRY_AFTER, retry_after=retry_after))
+            else:
+                print("❌ Failed after multiple attempts.")
+
+        return None
+
+    def fetch_page(self, job_title, page=1):
+        """Fetches one results page for a job title, from the response cache when one is configured.
+
+        Returns the normalized jobs on the page and the total result count Adzuna reports.
+        """
+        params = {
+            "app_id": self.app_id,
+            "app_key": self.api_key,
+            "what": job_title,
+            "where": self.location,
+            "results_per_page": self.results_per_page
+        }
+        url = f"{self.base_url}/{page}"
+
+        def request():
+            return self._request_page(url, params, job_title)
+
+        if self.cache is not None:
+            # The cache leaves the credentials out of its key
+            data = self.cache.get_or_fetch({"url": url, **params}, request)
+        else:
+            data = request()
+        if data is None:
+            return [], 0
+
+        jobs = [self._normalize_job(job) for job in data.get("results", [])]
+        if jobs:
+            print(f"✅ Data for '{job_title}' (page {page}) added.")
+        else:
+            print(f"❌ No job data returned for '{job_title}' (page {page}).")
+        return jobs, data.get("count", 0)
+
+    def iter_title_pages(self, job_title):
+        """Yields the result pages for one job title until max_pages is reached or results run out."""
+        for page in range(1, self.max_pages + 1):
+            jobs, count = self.fetch_page(job_title, page)
+            if not jobs:
+                return
+            yield jobs
+            if len(jobs) < self.results_per_page or page * self.results_per_page >= count:
+                return
+
+    def iter_job_pages(self, concurrent=False):
+        """Yields result pages for every job title as they arrive.
+
+        With ``concurrent=True`` the titles are crawled at once on a thread pool
+        capped at ``max_workers``, all sharing one keep-alive session. Pages are
+        handed over through a bounded queue, so a slow consumer throttles the
+        crawl instead of letting fetched pages pile up in memory. An error in any
+        worker is raised to the consumer, as the sequential crawl would raise it.
+        """
+        if not concurrent or len(self.job_titles) < 2:
+            for job_title in self.job_titles:
+                yield from self.iter_title_pages(job_title)
+            return
+
+        pages = queue.Queue(maxsize=self.max_workers * 2)
+        stop = threading.Event()
+        done = object()  # Sentinel each worker puts once its title is exhausted
+
+        def crawl(job_title):
+            try:
+                if stop.is_set():
+                    return
+                for jobs in self.iter_title_pages(job_title):
+                    pages.put(jobs)
+                    if stop.is_set():
+                        return
+            except Exception as e:
+                pages.put(e)
+            finally:
+                pages.put(done)
+
+        workers = min(self.max_workers, len(self.job_titles))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for job_title in self.job_titles:
+                executor.submit(crawl, job_title)
+
+            finished = 0
+            try:
+                while finished < len(self.job_titles):
+                    item = pages.get()
+                    if item is done:
+                        finished += 1
+                    elif isinstance(item, Exception):
+                        raise item
                     else:
-                        print(f"⚠️ Error fetching data for '{job_title}': {response.status_code}")
-                        print(f"Response: {response.text}")  # Debugging line
-                        if attempt < retries - 1:
-                            time.sleep(2 ** attempt)  # Exponential backoff
-                        else:
-                            print("❌ Failed after multiple attempts.")
-                
-                except requests.exceptions.RequestException as e:
-                    print(f"🚨 Request failed for '{job_title}': {e}")
-                    time.sleep(2 ** attempt)
-        
-        if all_jobs:
-            self.save_to_db(all_jobs)
-            print("✅ Data saved to database.")
+                        yield item
+            finally:
+                # The consumer may stop early; unblock the workers so the pool can shut down
+                stop.set()
+                while finished < len(self.job_titles):
+                    if pages.get() is done:
+                        finished += 1
+
+    def scrape_jobs(self, concurrent=False):
+        """Fetches job listings from Adzuna API and stores them in the database.
+
+        Each page is written as soon as it arrives, so memory use does not grow
+        with the number of pages crawled. Returns the number of jobs saved.
+        """
+        saved = 0
+        for jobs in self.iter_job_pages(concurrent=concurrent):
+            self.save_to_db(jobs)
+            saved += len(jobs)
+
+        if saved:
+            print(f"✅ {saved} jobs saved to database ({self.writer.rows_per_sec:,.0f} rows/sec overall).")
         else:
             print("❌ No job data to save.")
+        return saved
 
+    @_serialized
     def save_to_db(self, jobs):
-        """Saves job data to SQLite database."""
+        """Upserts job data into the SQLite database, updating listings that are already stored."""
         try:
-            df = pd.DataFrame(jobs)
-            df.to_sql("jobs", self.conn, if_exists="append", index=False)
+            count = self.writer.write(jobs)
+            print(f"💾 Saved {count} jobs ({self.writer.last_rate:,.0f} rows/sec).")
         except Exception as e:
             print(f"❌ Error saving to database: {e}")
+            return
+
+        if self.extract_skills:
+            try:
+                self.update_job_skills()
+            except Exception as e:
+                print(f"❌ Error extracting job skills: {e}")
+
+        if self.detect_duplicates:
+            try:
+                update_duplicate_clusters(self.conn)
+            except Exception as e:
+                print(f"❌ Error detecting duplicate jobs: {e}")
+
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO metadata (name, value) VALUES ('last_ingest', ?)", (time.time(),)
+            )
+
+    @_reading
+    def last_ingest(self):
+        """Returns the time of the last save_to_db as a Unix timestamp, or 0 if nothing was ever saved."""
+        row = self.read_conn.execute("SELECT value FROM metadata WHERE name = 'last_ingest'").fetchone()
+        return row[0] if row else 0
+
+    @_serialized
+    def update_job_skills(self, batch_size=500):
+        """Extracts skills for jobs that are new, changed or processed with an older taxonomy.
+
+        Results are written to job_skills and the job is stamped with the taxonomy
+        version, so repeated calls only process rows that still need it.
+        Returns the number of jobs processed.
+        """
+        version = get_skill_taxonomy()["version"]
+        processed = 0
+        while True:
+            # Written as ranges rather than != so the skills_version index can serve every branch
+            rows = self.conn.execute(
+                "SELECT id, title, description FROM jobs "
+                "WHERE skills_version IS NULL OR skills_version < ? OR skills_version > ? LIMIT ?",
+                (version, version, batch_size)
+            ).fetchall()
+            if not rows:
+                return processed
+
+            texts = (f"{title or ''}\n{description or ''}" for _, title, description in rows)
+            job_skills = [
+                (job_id, skill)
+                for (job_id, _, _), skills in zip(rows, extract_skills_batch(texts))
+                for skill in skills
+            ]
+            job_ids = [(job_id,) for job_id, _, _ in rows]
+            with self.conn:
+                self.conn.executemany("DELETE FROM job_skills WHERE job_id = ?", job_ids)
+                self.conn.executemany("INSERT OR IGNORE INTO job_skills (job_id, skill) VALUES (?, ?)", job_skills)
+                self.conn.executemany(
+                    "UPDATE jobs SET skills_version = ? WHERE id = ?",
+                    [(version, job_id) for (job_id,) in job_ids]
+                )
+            processed += len(rows)
+
+    @_reading
+    def get_job_skills(self, job_id):
+        """Returns the stored skills of a job, or None if its skills have not been extracted yet."""
+        row = self.read_conn.execute("SELECT skills_version FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        return [skill for (skill,) in self.read_conn.execute(
+            "SELECT skill FROM job_skills WHERE job_id = ? ORDER BY skill", (job_id,)
+        )]
     
+    @_reading
     def get_saved_jobs(self):
         """Retrieves saved jobs from the database."""
-        return pd.read_sql("SELECT * FROM jobs", self.conn)
+        return pd.read_sql("SELECT * FROM jobs", self.read_conn)
+
+    @_reading
+    def query_jobs(self, titles=None, company=None, location=None, created_from=None, created_to=None,
+                   salary_min=None, salary_max=None, skills=None, collapse_duplicates=False,
+                   order_by="created", descending=True, limit=50, after=None, columns=None):
+        """Retrieves one page of saved jobs matching the given filters.
+
+        - titles: job titles to match; a job matches if its title contains any of them
+        - company: exact company name (case-insensitive)
+        - location: text the job location must contain
+        - created_from / created_to: inclusive bounds on the posting date (date, datetime or ISO string)
+        - salary_min / salary_max: the advertised range must reach salary_min and start at or below salary_max
+        - skills: canonical skill names the job must require, all of them (case-insensitive)
+        - collapse_duplicates: return only the representative of each near-duplicate cluster
+        - order_by: one of "created", "salary_min", "salary_max"; ties are broken by id.
+          Jobs without a salary are skipped when sorting by salary.
+        - after: the cursor returned with the previous page, for keyset pagination
+        - columns: columns to select (defaults to SUMMARY_COLUMNS, which omits the description)
+
+        Returns a (DataFrame, cursor) tuple; cursor is None once there are no more pages.
+        """
+        if order_by not in SORT_COLUMNS:
+            raise ValueError(f"order_by must be one of {SORT_COLUMNS}, got {order_by!r}")
+
+        columns = list(columns or SUMMARY_COLUMNS)
+        unknown = set(columns) - set(SUMMARY_COLUMNS) - set(JOB_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown job columns: {sorted(unknown)}")
+        # The cursor is built from the sort key, so it is always selected
+        selected = columns + [column for column in ("id", order_by) if column not in columns]
+
+        conditions, params = [], []
+        if titles:
+            conditions.append("(" + " OR ".join("title LIKE ? ESCAPE '\\'" for _ in titles) + ")")
+            params.extend(f"%{_escape_like(title)}%" for title in titles)
+        if company:
+            conditions.append("company = ? COLLATE NOCASE")
+            params.append(company)
+        if location:
+            conditions.append("location LIKE ? ESCAPE '\\'")
+            params.append(f"%{_escape_like(location)}%")
+        if created_from:
+            conditions.append("created >= ?")
+            params.append(created_from.isoformat() if hasattr(created_from, "isoformat") else created_from)
+        if created_to:
+            if isinstance(created_to, date) and not isinstance(created_to, datetime):
+                # Timestamps on the last day sort after the bare date, so bound by the next day
+                conditions.append("created < ?")
+                params.append((created_to + timedelta(days=1)).isoformat())
+            else:
+                conditions.append("created <= ?")
+                params.append(created_to.isoformat() if hasattr(created_to, "isoformat") else created_to)
+        if salary_min is not None:
+            conditions.append("salary_max >= ?")
+            params.append(salary_min)
+        if salary_max is not None:
+            conditions.append("salary_min <= ?")
+            params.append(salary_max)
+        if skills:
+            skills = list(dict.fromkeys(skill.lower() for skill in skills))
+            conditions.append(
+                f"id IN (SELECT job_id FROM job_skills WHERE skill IN ({', '.join('?' for _ in skills)}) "
+                "GROUP BY job_id HAVING COUNT(*) = ?)"
+            )
+            params.extend(skills)
+            params.append(len(skills))
+        if order_by != "created":
+            conditions.append(f"{order_by} IS NOT NULL")
+
+        where = " WHERE " + " AND ".join(conditions) if conditions else ""
+        query = f"SELECT {', '.join(selected)} FROM jobs{where}"
+        if collapse_duplicates:
+            # One job per cluster among the matching rows, the representative if it matches too;
+            # jobs not clustered yet are their own cluster. The cursor applies after collapsing.
+            query = f"""
+            SELECT {', '.join(selected)} FROM (
+                SELECT {', '.join(selected)}, ROW_NUMBER() OVER (
+                    PARTITION BY COALESCE(cluster_id, id) ORDER BY cluster_id = id DESC, id
+                ) AS cluster_rank
+                FROM jobs{where}
+            ) WHERE cluster_rank = 1"""
+        if after is not None:
+            query += " AND " if collapse_duplicates or conditions else " WHERE "
+            query += f"({order_by}, id) {'<' if descending else '>'} (?, ?)"
+            params.extend(after)
+
+        direction = "DESC" if descending else "ASC"
+        query += f" ORDER BY {order_by} {direction}, id {direction} LIMIT ?"
+        params.append(limit)
+
+        jobs = pd.read_sql(query, self.read_conn, params=params)
+        cursor = None
+        if len(jobs) == limit:
+            last = jobs.iloc[-1]
+            cursor = (last[order_by].item() if hasattr(last[order_by], "item") else last[order_by],
+                      int(last["id"]))
+        return jobs[columns], cursor
+
+    @_reading
+    def search_jobs(self, text, limit=20):
+        """Full-text searches saved jobs and returns the best BM25 matches with a description snippet.
+
+        Every word in ``text`` must appear in the title, company or description.
+        Title matches weigh most; ``score`` is the BM25 rank, lower is better.
+        """
+        query = _fts_query(text)
+        if not query:
+            return pd.DataFrame(columns=SUMMARY_COLUMNS + ["snippet", "score"])
+
+        return pd.read_sql(
+            f'''
+            SELECT {", ".join("jobs." + column for column in SUMMARY_COLUMNS)},
+                   snippet(jobs_fts, 2, '**', '**', '…', 16) AS snippet,
+                   bm25(jobs_fts, 10.0, 5.0, 1.0) AS score
+            FROM jobs_fts
+            JOIN jobs ON jobs.id = jobs_fts.rowid
+            WHERE jobs_fts MATCH ?
+            ORDER BY score
+            LIMIT ?
+            ''',
+            self.read_conn,
+            params=[query, limit]
+        )
+
+    def rank_jobs_for_cv(self, cv_text, top_k=10):
+        """Ranks every saved job by TF-IDF similarity to a CV and returns the top_k best fits.
+
+        The ranker is shared per database and only indexes jobs added since its
+        last use. Alongside the summary columns, each row carries its ``score``,
+        the CV terms it matched and the stored job skills that also appear in the CV.
+        """
+        from src.job_ranker import get_job_ranker
+
+        ranker = get_job_ranker(self.db_name)
+        # Indexing new jobs can take a while, so it runs on its own connection without blocking queries
+        ranker.sync(self.ranker_conn)
+        with self._db_lock, self.conn:
+            ranker.trim_changes(self.conn)
+        ranked = ranker.rank(cv_text, top_k)
+        if not ranked:
+            return pd.DataFrame(columns=SUMMARY_COLUMNS + ["score", "matched_terms", "matched_skills"])
+
+        job_ids = [result["job_id"] for result in ranked]
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._read_lock:
+            jobs = pd.read_sql(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM jobs WHERE id IN ({placeholders})",
+                self.read_conn,
+                params=job_ids
+            )
+            stored_skills = self.read_conn.execute(
+                f"SELECT job_id, skill FROM job_skills WHERE job_id IN ({placeholders}) ORDER BY skill", job_ids
+            ).fetchall()
+        cv_skills = {skill.lower() for skill in extract_skills_from_description(cv_text)}
+        job_skills = {}
+        for job_id, skill in stored_skills:
+            if skill.lower() in cv_skills:
+                job_skills.setdefault(job_id, []).append(skill)
+
+        scores = pd.DataFrame(ranked)
+        scores["matched_skills"] = [job_skills.get(job_id, []) for job_id in scores["job_id"]]
+        # Inner join drops jobs deleted since they were indexed, and keeps the ranking order
+        return scores.merge(jobs, left_on="job_id", right_on="id").drop(columns="job_id")[
+            SUMMARY_COLUMNS + ["score", "matched_terms", "matched_skills"]
+        ]
+
+    @_reading
+    def get_job(self, job_id):
+        """Retrieves a single saved job, description included, or None if it does not exist."""
+        jobs = pd.read_sql("SELECT * FROM jobs WHERE id = ?", self.read_conn, params=[job_id])
+        return None if jobs.empty else jobs.iloc[0]
+    
+    @_reading
+    def get_jobs(self, job_ids):
+        """Retrieves several saved jobs, descriptions included, in the order of job_ids."""
+        job_ids = [int(job_id) for job_id in job_ids]
+        if not job_ids:
+            return pd.DataFrame()
+        jobs = pd.read_sql(
+            f"SELECT * FROM jobs WHERE id IN ({', '.join('?' for _ in job_ids)})", self.read_conn, params=job_ids
+        )
+        return jobs.set_index("id", drop=False).reindex(job_ids).dropna(subset=["id"]).reset_index(drop=True)
     
+    @_reading
     def check_db(self):
         """Check if the database is populated."""
         query = "SELECT COUNT(*) FROM jobs"
-        result = self.conn.execute(query).fetchone()
+        result = self.read_conn.execute(query).fetchone()
         print(f"📊 Number of jobs in the database: {result[0]}")
 
 if __name__ == "__main__":
@@ -0,0 +1,28 @@
+import threading
+import functools
+
+
+def lazy_resource(factory):
+    """Turns a zero-argument factory into an accessor that builds the resource once, on first use.
+
+    Safe to call from several threads: the factory runs at most once and every
+    caller gets the same instance. ``accessor.reset()`` drops the instance so
+    the next call builds it again.
+    """
+    lock = threading.Lock()
+    instance = []
+
+    @functools.wraps(factory)
+    def accessor():
+        if not instance:
+            with lock:
+                if not instance:
+                    instance.append(factory())
+        return instance[0]
+
+    def reset():
+        with lock:
+            instance.clear()
+
+    accessor.reset = reset
+    return accessor
@@ -0,0 +1,127 @@
+import os
+import asyncio
+import hashlib
+from src.env import load_env
+from src.lazy import lazy_resource
+from src.response_cache import ResponseCache
+
+GEMINI_MODEL = "gemini-2.5-flash"
+GEMINI_TEMPERATURE = 0.2
+LLM_CACHE_PATH = os.path.join("cache", "llm.db")
+# Polished letters do not go stale the way search results do; the size bound does most of the evicting
+LLM_CACHE_TTL = 30 * 24 * 60 * 60
+
+POLISH_PROMPT = """
+    Improve the following cover letter:
+    - Fix grammar, clarity, and formatting
+    - Improve flow and professionalism
+    - Remove repetition
+    - Keep all factual details
+    - Return ONLY the improved cover letter text.
+
+    --- RAW COVER LETTER ---
+    {raw_text}
+    --- END ---
+    """
+
+
+@lazy_resource
+def get_gemini_llm():
+    """Returns the shared Gemini chat client, creating it on first use.
+
+    Loads the API key from the GOOGLE_API_KEY environment variable.
+    """
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    load_env()
+    google_api_key = os.getenv("GOOGLE_API_KEY")
+    if not google_api_key:
+        raise ValueError("GOOGLE_API_KEY is not set in environment variables.")
+
+    return ChatGoogleGenerativeAI(
+        model=GEMINI_MODEL,
+        temperature=GEMINI_TEMPERATURE,
+        google_api_key=google_api_key
+    )
+
+
+@lazy_resource
+def get_llm_cache():
+    """Returns the shared cache of LLM responses, opening it on first use."""
+    return ResponseCache(db_path=LLM_CACHE_PATH, ttl=LLM_CACHE_TTL, max_entries=2000, exclude=())
+
+
+def llm_cache_params(prompt, model=GEMINI_MODEL, temperature=GEMINI_TEMPERATURE):
+    """Cache key parameters for a prompt: the model settings plus a hash of the exact prompt text."""
+    return {
+        "model": model,
+        "temperature": temperature,
+        "prompt_sha256": hashlib.sha256(prompt.encode("utf-8")).hexdigest(),
+    }
+
+
+def build_polish_prompt(raw_text):
+    return POLISH_PROMPT.format(raw_text=raw_text)
+
+
+def improve_cover_letter_with_gemini(raw_text: str) -> str:
+    """
+    Uses Gemini 2.5 Flash to improve the cover letter.
+    A letter that was already polished with the same model settings is served from the cache.
+    """
+    from langchain.messages import HumanMessage
+
+    prompt = build_polish_prompt(raw_text)
+
+    def polish():
+        response = get_gemini_llm().invoke([HumanMessage(content=prompt)])
+        return response.text.strip()
+
+    return get_llm_cache().get_or_fetch(llm_cache_params(prompt), polish)
+
+
+def stream_cover_letter_with_gemini(raw_text):
+    """Yields the improved cover letter in chunks as the model produces them.
+
+    A letter found in the cache is yielded whole. Otherwise the joined chunks
+    are cached once the stream completes, so a stream cut short is not stored.
+    """
+    from langchain.messages import HumanMessage
+
+    prompt = build_polish_prompt(raw_text)
+    params = llm_cache_params(prompt)
+    cache = get_llm_cache()
+    cached = cache.get_fresh(params)
+    if cached is not None:
+        yield cached
+        return
+
+    chunks = []
+    for chunk in get_gemini_llm().stream([HumanMessage(content=prompt)]):
+        # Leading whitespace is dropped, as the non-streaming call strips it
+        text = chunk.text if chunks else chunk.text.lstrip()
+        if text:
+            chunks.append(text)
+            yield text
+    cache.set(params, "".join(chunks).strip())
+
+
+async def aimprove_cover_letter_with_gemini(raw_text, timeout=None):
+    """Async variant of improve_cover_letter_with_gemini sharing the same client and cache.
+
+    - timeout: seconds to wait for the model before raising asyncio.TimeoutError, or None to wait indefinitely
+    """
+    from langchain.messages import HumanMessage
+
+    prompt = build_polish_prompt(raw_text)
+
+    async def polish():
+        response = await asyncio.wait_for(get_gemini_llm().ainvoke([HumanMessage(content=prompt)]), timeout)
+        return response.text.strip()
+
+    return await get_llm_cache().aget_or_fetch(llm_cache_params(prompt), polish)
+
+
+def llm_cache_stats():
+    """Returns the hit/miss counters and size of the LLM response cache."""
+    return get_llm_cache().stats()
@@ -0,0 +1,124 @@
+import re
+import zlib
+import numpy as np
+
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: postings become candidates from about 0.7 estimated Jaccard similarity
+NUM_BANDS = 16
+SHINGLE_SIZE = 4
+SIMILARITY_THRESHOLD = 0.8
+# Listing descriptions are short snippets that often open with the same company blurb,
+# so duplicates must also share most of their title words
+TITLE_SIMILARITY_THRESHOLD = 0.5
+
+_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)  # Fixed seed: stored signatures must stay comparable
+_A = _rng.integers(1, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+_B = _rng.integers(0, _PRIME, NUM_PERMUTATIONS, dtype=np.int64)
+
+
+def shingles(text, size=SHINGLE_SIZE):
+    """Returns the distinct 32-bit hashes of a text's word shingles."""
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) < size:
+        grams = [" ".join(words)] if words else []
+    else:
+        grams = (" ".join(words[i:i + size]) for i in range(len(words) - size + 1))
+    return np.unique(np.fromiter((zlib.crc32(gram.encode("utf-8")) for gram in grams), dtype=np.int64))
+
+
+def minhash_signature(text):
+    """Returns the MinHash signature of a text, or None when it has no words."""
+    hashed = shingles(text)
+    if hashed.size == 0:
+        return None
+    # Each row applies one universal hash (a*x + b) mod p to every shingle and keeps the minimum
+    return ((_A[:, None] * (hashed[None, :] % _PRIME) + _B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def band_buckets(signature):
+    """Returns (band, bucket) pairs; postings sharing any pair are candidate duplicates."""
+    rows = NUM_PERMUTATIONS // NUM_BANDS
+    return [(band, zlib.crc32(signature[band * rows:(band + 1) * rows].tobytes()))
+            for band in range(NUM_BANDS)]
+
+
+def title_similarity(first, second):
+    """Jaccard similarity of the word sets of two titles."""
+    first_words = set(re.findall(r"\w+", (first or "").lower()))
+    second_words = set(re.findall(r"\w+", (second or "").lower()))
+    if not first_words or not second_words:
+        return 0.0
+    return len(first_words & second_words) / len(first_words | second_words)
+
+
+def estimated_similarity(first, second):
+    """Estimates the Jaccard similarity of two postings from their signatures."""
+    return float(np.mean(first == second))
+
+
+def update_duplicate_clusters(conn, batch_size=500, threshold=SIMILARITY_THRESHOLD):
+    """Signs jobs that have no cluster yet and assigns each to a near-duplicate cluster.
+
+    A job whose description is at least ``threshold`` similar to an already
+    clustered job, and whose title shares most of its words, joins that job's
+    cluster; otherwise it starts its own, with itself as the representative.
+    Candidates come from the LSH bucket index, so each job is compared with a
+    handful of postings rather than the archive.
+
+    A job is re-clustered when its title or description changed. If it was a
+    representative, its members are re-clustered too, so none of them is left
+    pointing at a posting that no longer stands for them.
+    Returns the number of jobs processed.
+    """
+    processed = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, title, description FROM jobs WHERE cluster_id IS NULL ORDER BY id LIMIT ?", (batch_size,)
+        ).fetchall()
+        if not rows:
+            return processed
+
+        with conn:
+            for job_id, title, description in rows:
+                conn.execute("UPDATE jobs SET cluster_id = NULL WHERE cluster_id = ? AND id != ?", (job_id, job_id))
+                conn.execute("DELETE FROM job_minhash WHERE job_id = ?", (job_id,))
+                conn.execute("DELETE FROM job_lsh_buckets WHERE job_id = ?", (job_id,))
+                signature = minhash_signature(description)
+                if signature is None:
+                    conn.execute("UPDATE jobs SET cluster_id = id WHERE id = ?", (job_id,))
+                    continue
+
+                buckets = band_buckets(signature)
+                candidates = conn.execute(
+                    f"""
+                    SELECT m.job_id, m.signature, j.cluster_id, j.title
+                    FROM job_minhash m JOIN jobs j ON j.id = m.job_id
+                    WHERE m.job_id IN (
+                        SELECT job_id FROM job_lsh_buckets
+                        WHERE (band, bucket) IN (VALUES {", ".join("(?, ?)" for _ in buckets)})
+                    )
+                    """,
+                    [value for bucket in buckets for value in bucket]
+                ).fetchall()
+
+                cluster_id, best = job_id, threshold
+                for candidate_id, candidate_signature, candidate_cluster, candidate_title in candidates:
+                    # Jobs waiting to be re-clustered may yet move; they will compare against this one later
+                    if candidate_cluster is None:
+                        continue
+                    if title_similarity(title, candidate_title) < TITLE_SIMILARITY_THRESHOLD:
+                        continue
+                    similarity = estimated_similarity(signature, np.frombuffer(candidate_signature, dtype=np.uint32))
+                    if similarity >= best:
+                        cluster_id, best = candidate_cluster, similarity
+
+                conn.execute(
+                    "INSERT INTO job_minhash (job_id, signature) VALUES (?, ?)", (job_id, signature.tobytes())
+                )
+                conn.executemany(
+                    "INSERT OR IGNORE INTO job_lsh_buckets (band, bucket, job_id) VALUES (?, ?, ?)",
+                    [(band, bucket, job_id) for band, bucket in buckets]
+                )
+                conn.execute("UPDATE jobs SET cluster_id = ? WHERE id = ?", (cluster_id, job_id))
+        processed += len(rows)
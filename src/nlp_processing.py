@@ -1,31 +1,106 @@
-import spacy
+import os
+import json
+import threading
+from src.lazy import lazy_resource
 
-nlp = spacy.load("en_core_web_sm")
+SKILL_TAXONOMY_PATH = os.path.join(os.path.dirname(__file__), "skill_taxonomy.json")
 
-def extract_skills_from_description(job_desc):
-    skills = ["Python", "Machine Learning", "Data Analysis", "AI", "Deep Learning", "SQL", "Java", "Cloud Computing"]
-    doc = nlp(job_desc)
-    extracted_skills = set()
-    for token in doc:
-        if token.text.lower() in [skill.lower() for skill in skills]:
-            extracted_skills.add(token.text)
-    return list(extracted_skills)
+_skill_taxonomy = None
+_skill_matcher = None
+_case_sensitive_matcher = None
+_taxonomy_lock = threading.RLock()
+
+
+@lazy_resource
+def get_nlp():
+    """Returns the shared spaCy pipeline, loading it on first use."""
+    import spacy
+    return spacy.load("en_core_web_sm")
+
+
+def load_skill_taxonomy(path=SKILL_TAXONOMY_PATH):
+    """Loads a skill taxonomy and rebuilds the skill matcher from it.
+
+    The file maps each canonical skill name to its synonyms and aliases, and
+    lists the names and aliases that are also ordinary words or acronyms, which
+    only match with their exact casing ("Spark", not "spark joy"):
+    {"version": "2", "skills": {"Machine Learning": ["ML"], ...}, "case_sensitive": ["ML", ...]}
+    """
+    from spacy.matcher import PhraseMatcher
+
+    global _skill_taxonomy, _skill_matcher, _case_sensitive_matcher
+    with open(path, encoding="utf-8") as f:
+        taxonomy = json.load(f)
+
+    # Patterns only need tokenizing; matching on LOWER makes them case-insensitive, ORTH exact
+    nlp = get_nlp()
+    case_sensitive = set(taxonomy.get("case_sensitive", []))
+    matcher = PhraseMatcher(nlp.vocab, attr="LOWER")
+    exact_matcher = PhraseMatcher(nlp.vocab, attr="ORTH")
+    for skill, aliases in taxonomy["skills"].items():
+        terms = [skill, *aliases]
+        patterns = [term for term in terms if term not in case_sensitive]
+        exact_patterns = [term for term in terms if term in case_sensitive]
+        if patterns:
+            matcher.add(skill, list(nlp.tokenizer.pipe(patterns)))
+        if exact_patterns:
+            exact_matcher.add(skill, list(nlp.tokenizer.pipe(exact_patterns)))
+
+    with _taxonomy_lock:
+        _skill_taxonomy, _skill_matcher, _case_sensitive_matcher = taxonomy, matcher, exact_matcher
+    return taxonomy
 
 
-# cover_letter_generator.py
-from src.nlp_processing import extract_skills_from_description
+def _ensure_taxonomy():
+    """Loads the bundled taxonomy once, even when several threads ask for it at the same time."""
+    if _skill_matcher is None:
+        with _taxonomy_lock:
+            if _skill_matcher is None:
+                load_skill_taxonomy()
 
-def generate_cover_letter(job_title, company, job_desc):
-    skills = extract_skills_from_description(job_desc)
-    cover_letter = f"""
-    Dear Hiring Manager,
 
-    I am excited to apply for the {job_title} position at {company}. With a strong background in {', '.join(skills)}, 
-    I am eager to contribute my expertise to your team.
+def get_skill_taxonomy():
+    """Returns the loaded skill taxonomy, loading the bundled one on first use."""
+    _ensure_taxonomy()
+    return _skill_taxonomy
+
+
+def get_skill_matcher():
+    """Returns the compiled case-insensitive PhraseMatcher for the loaded skill taxonomy."""
+    _ensure_taxonomy()
+    return _skill_matcher
+
+
+def get_case_sensitive_matcher():
+    """Returns the compiled PhraseMatcher for the taxonomy terms that must match their exact casing."""
+    _ensure_taxonomy()
+    return _case_sensitive_matcher
+
+
+def match_skills(doc):
+    """Returns the canonical names of the taxonomy skills mentioned in a Doc, in order of appearance."""
+    skills = {}
+    matches = get_skill_matcher()(doc) + get_case_sensitive_matcher()(doc)
+    for match_id, _, _ in sorted(matches, key=lambda match: match[1]):
+        skills.setdefault(doc.vocab.strings[match_id], None)
+    return list(skills)
+
+
+def extract_skills_from_description(job_desc):
+    # Skill matching only looks at tokens, so the tagger, parser and NER are skipped
+    doc = get_nlp().make_doc(job_desc)
+    return match_skills(doc)
+
 
-    Job Description: {job_desc}
+def extract_skills_batch(descriptions, batch_size=256, n_process=1):
+    """Yields the skills of each description, in input order, tokenizing them in batches with nlp.pipe.
 
-    I look forward to the opportunity to discuss my application.
-    Thank you for your consideration.
+    - descriptions: any iterable of description strings; it is consumed lazily
+    - batch_size: number of texts handed to each nlp.pipe batch
+    - n_process: worker processes used for tokenizing (-1 uses every CPU)
     """
-    return cover_letter
\ No newline at end of file
+    nlp = get_nlp()
+    texts = (description or "" for description in descriptions)
+    docs = nlp.pipe(texts, batch_size=batch_size, n_process=n_process, disable=nlp.pipe_names)
+    for doc in docs:
+        yield match_skills(doc)
@@ -0,0 +1,149 @@
+import time
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` requests per second with bursts of up to ``capacity``."""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Blocks until a token is available, then takes it."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Drains the bucket so no caller gets a token for ``seconds``, e.g. after a Retry-After."""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, -seconds * self.rate)
+
+
+class CircuitBreaker:
+    """Stops calling an endpoint after repeated failures and probes it again after a cool-down.
+
+    - failure_threshold: consecutive failures that open the circuit
+    - reset_timeout: seconds the circuit stays open before a single trial request is let through
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=60):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.open_for = reset_timeout
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    def allow_request(self):
+        """Returns True if a request may be sent now."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self.trial_in_flight or time.monotonic() - self.opened_at < self.open_for:
+                return False
+            # Half-open: let exactly one request test the endpoint
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.open_for = self.reset_timeout
+            self.trial_in_flight = False
+
+    def trip(self, seconds):
+        """Opens the circuit at once for at least ``seconds``, e.g. when the server asks for a long pause."""
+        with self._lock:
+            self.opened_at = time.monotonic()
+            self.open_for = max(self.reset_timeout, seconds)
+            self.trial_in_flight = False
+
+
+def parse_retry_after(value):
+    """Converts a Retry-After header (delta seconds or HTTP date) to seconds, or None if absent or invalid."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0, retry_after=None):
+    """Returns the seconds to wait before retry number ``attempt`` (0-based).
+
+    Uses full-jitter exponential backoff so parallel callers spread out. A
+    server-provided Retry-After is treated as the minimum wait; like every
+    delay it is clamped to ``cap``, so callers should give up rather than
+    retry when the server asks for longer.
+    """
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, base)
+    return min(cap, delay)
+
+
+_rate_limiters = {}
+_circuit_breakers = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(name, rate, capacity=None):
+    """Returns the process-wide token bucket for ``name``, creating it on first use.
+
+    Later callers asking for a different rate update the shared bucket.
+    """
+    with _registry_lock:
+        limiter = _rate_limiters.get(name)
+        if limiter is None:
+            limiter = _rate_limiters[name] = TokenBucket(rate, capacity)
+        elif limiter.rate != rate:
+            limiter.rate = float(rate)
+        return limiter
+
+
+def get_circuit_breaker(name, failure_threshold=5, reset_timeout=60):
+    """Returns the process-wide circuit breaker for ``name``, creating it on first use."""
+    with _registry_lock:
+        breaker = _circuit_breakers.get(name)
+        if breaker is None:
+            breaker = _circuit_breakers[name] = CircuitBreaker(failure_threshold, reset_timeout)
+        return breaker
@@ -0,0 +1,165 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+
+class ResponseCache:
+    """Persistent cache of JSON responses keyed by normalized request parameters.
+
+    - db_path: SQLite file holding the cache
+    - ttl: seconds an entry stays fresh
+    - max_entries: size bound; the least recently used entries are evicted beyond it
+    - exclude: parameters left out of the key, such as credentials
+    - stale_while_revalidate: serve expired entries at once and refresh them in the background
+    """
+
+    def __init__(self, db_path="cache/responses.db", ttl=6 * 60 * 60, max_entries=5000,
+                 exclude=("app_id", "app_key"), stale_while_revalidate=False):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.exclude = set(exclude)
+        self.stale_while_revalidate = stale_while_revalidate
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # Shared by the crawl threads; every use is serialized through self._lock
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute('''
+        CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL,
+            stored_at REAL NOT NULL,
+            last_access REAL NOT NULL
+        )
+        ''')
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+        self.conn.commit()
+
+    def make_key(self, params):
+        """Hashes the request parameters, ignoring excluded ones, key order, case and surrounding whitespace."""
+        normalized = {
+            name: value.strip().lower() if isinstance(value, str) else value
+            for name, value in params.items()
+            if name not in self.exclude
+        }
+        encoded = json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, params):
+        """Returns (value, is_fresh) for a cached response, or None if nothing is stored."""
+        key = self.make_key(params)
+        now = time.time()
+        with self._lock:
+            row = self.conn.execute("SELECT value, stored_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            with self.conn:
+                self.conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]), now - row[1] < self.ttl
+
+    def set(self, params, value):
+        """Stores a response and evicts the least recently used entries beyond max_entries."""
+        key = self.make_key(params)
+        now = time.time()
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, stored_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now)
+            )
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def get_or_fetch(self, params, fetch):
+        """Returns the cached response for params, calling fetch() and caching its result on a miss.
+
+        fetch() should return None on failure; failures are not cached.
+        """
+        cached = self.get(params)
+        if cached is not None:
+            value, is_fresh = cached
+            if is_fresh:
+                self.hits += 1
+                return value
+            if self.stale_while_revalidate:
+                self.stale_hits += 1
+                self._refresh_in_background(params, fetch)
+                return value
+
+        self.misses += 1
+        value = fetch()
+        if value is not None:
+            self.set(params, value)
+        return value
+
+    def get_fresh(self, params):
+        """Returns the cached response if it is still fresh, or None, counting the lookup as a hit or miss."""
+        cached = self.get(params)
+        if cached is not None and cached[1]:
+            self.hits += 1
+            return cached[0]
+        self.misses += 1
+        return None
+
+    async def aget_or_fetch(self, params, fetch):
+        """Async get_or_fetch: awaits fetch() on a miss. Stale entries are always re-fetched."""
+        value = self.get_fresh(params)
+        if value is not None:
+            return value
+
+        value = await fetch()
+        if value is not None:
+            self.set(params, value)
+        return value
+
+    def _refresh_in_background(self, params, fetch):
+        """Re-fetches a stale entry on a daemon thread, at most once at a time per key."""
+        key = self.make_key(params)
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = fetch()
+                if value is not None:
+                    self.set(params, value)
+            except Exception as e:
+                logging.warning("Background refresh of cached response failed: %s", e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def stats(self):
+        """Returns hit/miss counters for this instance and the number of stored entries."""
+        with self._lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            "entries": entries,
+        }
+
+    def clear(self):
+        """Removes every cached response."""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM responses")
@@ -0,0 +1,46 @@
+import os
+import sys
+import subprocess
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Packages that must only load on first use, never when a module is imported
+HEAVY_PACKAGES = ("spacy", "langchain", "langchain_groq", "langchain_google_genai", "scipy")
+
+# Cumulative import time allowed per module, in seconds: about twice the measured time
+# (nlp_processing ~3 ms, cover_latter_generator ~90 ms, job_scraper ~0.5 s, mostly pandas and requests)
+IMPORT_BUDGETS = {
+    "src.nlp_processing": 0.01,
+    "src.cover_latter_generator": 0.2,
+    "src.job_scraper": 1.0,
+}
+
+
+def import_times(module):
+    """Imports a module in a fresh interpreter and returns {module name: cumulative seconds}."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        # Lines look like "import time:       461 |       3674 | src.nlp_processing"
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_does_not_load_heavy_packages(module):
+    loaded = [name for name in import_times(module) if name.split(".")[0] in HEAVY_PACKAGES]
+    assert not loaded, f"importing {module} loads {loaded}"
+
+
+@pytest.mark.parametrize("module", sorted(IMPORT_BUDGETS))
+def test_import_time_within_budget(module):
+    elapsed = import_times(module)[module]
+    assert elapsed < IMPORT_BUDGETS[module], f"importing {module} took {elapsed:.2f}s"